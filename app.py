@@ -1,328 +1,397 @@
-from dash import Dash, dcc, html, Input, Output, State, callback, dash_table
+import dash
+from dash import Dash, dcc, html, Input, Output, State, ClientsideFunction, dash_table
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-from cs_clean_data import flatten_dict
-from cs_api import get_detections_list, get_detection_data, get_access_token
-import io
+import plotly.io as pio
+import pandas as pd
+import flask
+import cs_cache
+import cs_refresh
+import cs_telemetry
+from cs_telemetry import timed, instrument_callback
+from cs_store import get_alerts
+from cs_export import export_chunks, export_formats, export_frame, parquet_available
+from cs_analytics import analyst_metrics, day_counts, duration_metrics, format_duration
+from cs_table import date_bounds, query_page, page_tooltips
+import json
+import multiprocessing
+from datetime import datetime
 from dash.exceptions import PreventUpdate
 
 external_stylesheets = [
     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/4.7.0/css/font-awesome.min.css',  # Example of external CSS
 ]
 
-token = get_access_token()
-df = get_detection_data(get_detections_list(token),token)
-
-flattened_data = ([flatten_dict(row) for row in df if row.get('show_in_ui') != False])
-
-data = pd.DataFrame(flattened_data)
-data['created_timestamp'] = pd.to_datetime(data['created_timestamp'])
-
-oldest_date = data['created_timestamp'].min()
-newest_date = data['created_timestamp'].max()
+# Serve the last saved snapshot (or nothing) right away and sync in the background (CS_REFRESH_INTERVAL=0 turns that off).
+# Frame-building worker processes (CS_FRAME_WORKERS) import this module again and must not start a refresh of their own
+if multiprocessing.parent_process() is None:
+    cs_refresh.load_snapshot()
+    if cs_refresh.REFRESH_INTERVAL > 0:
+        cs_refresh.start()
+
+# Columns shown in the alerts table
+table_columns = [{'name': 'Timestamp', 'id': 'created_timestamp'},
+                 {'name': 'Hostname', 'id': 'hostname'},
+                 {'name': 'OS', 'id': 'os_version'},
+                 {'name': 'User', 'id': 'user_name'},
+                 {'name': 'Severity', 'id': 'severity_name'},
+                 {'name': 'Status', 'id': 'status'},
+                 {'name': 'Analyst', 'id': 'assigned_to_name'},
+                 {'name': 'Tag', 'id': 'tags0'},
+                 {'name': 'Comment', 'id': 'comment'},
+                 {'name': 'CID', 'id': 'cid'}
+                ]
+
+# Order and colors of the charts drawn in the browser (assets/clientside.js), sent once per page load with the plotly template
+chart_style = {
+    'severity_order': ['Informational', 'Low', 'Medium', 'High', 'Critical'],
+    'severity_colors': {'Critical': 'red', 'High': '#ff8200', 'Medium': '#ffc000', 'Low': '#04AA6D', 'Informational': 'blue'},
+    'status_colors': {'new': 'red', 'in_progress': '#ffc000', 'closed': '#04AA6D'},
+    'assigned_colors': {'Steven Caraballo': '#04AA6D', 'Mathew Benitez': '#ffc000', 'Omar Santiago': '#ff8200', 'Keith Blackler': 'red'},
+    'assigned_legend_order': ['Steven Caraballo', 'Mathew Benitez', 'Omar Santiago', 'Keith Blackler'],
+    'template': pio.templates[pio.templates.default].to_plotly_json()
+}
+
+# Day buckets each browser-drawn chart is summed from
+chart_keys = {'severity': ['assigned_to_name', 'severity_name'],
+              'status': ['status'],
+              'assigned': ['assigned_to_name']}
 
 # Initialize the app
 app = Dash(external_stylesheets=external_stylesheets)
 
-# App layout
-app.layout = html.Div([
-    html.Div([
-        html.H1(children='Metrics'),
-        html.Div([html.Button(id="btn_csv", children=["Download CSV ", html.I(className="fa fa-download")],className="button"),dcc.Store(id='stored-data'),dcc.Download(id="download-csv")]),
-        dcc.DatePickerRange(
-            id='date-picker-range',
-            start_date=oldest_date,
-            end_date=newest_date
-        ),
-    ], style={'width': '100%', 'display': 'flex', 'justify-content': 'space-between', 'align-items': 'center'}),
-    html.Div([
-            dash_table.DataTable(
-                id='table',
-                css=[{'selector': 'table', 'rule': 'table-layout: fixed'}],
-                data=data.to_dict('records'),
-                style_cell={
-                    'textOverflow': 'ellipsis',
-                    'overflow': 'hidden'
-                },
-                columns=[{'name': 'Timestamp', 'id': 'created_timestamp'},
-                            {'name': 'Hostname', 'id': 'hostname'},
-                            {'name': 'OS', 'id': 'os_version'},
-                            {'name': 'User', 'id': 'user_name'},
-                            {'name': 'Severity', 'id': 'severity_name'},
-                            {'name': 'Status', 'id': 'status'},
-                            {'name': 'Analyst', 'id': 'assigned_to_name'},
-                            {'name': 'Tag', 'id': 'tags0'},
-                            {'name': 'Comment', 'id': 'comment'},
-                            {'name': 'CID', 'id': 'cid'}
-                        ], 
-                page_size=5,
-                tooltip_data=[
-                    {
-                        column: {'value': str(value), 'type': 'markdown'}
-                        for column, value in row.items()
-                    } for row in data.to_dict('records')
-                ],
-                tooltip_duration=None
-            )
-        ], style={'width':'100%', 'display': 'inline-block', 'border': '1px solid red', 'padding': '10px', 'box-sizing': 'border-box'}),
-    html.Div([
-        html.Div([
-            dcc.Graph(id="sc_time_to_triage", style={'height': 100}),
-            dcc.Graph(id="sc_time_to_resolved", style={'height': 100})
-        ], style={'display': 'inline-block', 'width':'25%'}),
+# Tenants (CIDs) that can be picked in the selector; nothing picked shows every tenant
+def tenant_options(snapshot):
+    return [{'label': str(cid), 'value': cid} for cid in snapshot.partitions if cid is not None]
+
+# When the served frame was built, for the staleness label the browser keeps up to date,
+# and its newest alert, so the next refresh knows whether the picker still ends on it
+def refresh_info(snapshot):
+    if snapshot.refreshed_at is None:
+        return {'refreshed_at': None}
+    newest_date = cs_refresh.date_range(snapshot)[1]
+    return {'refreshed_at': snapshot.refreshed_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'refreshed_epoch': snapshot.refreshed_at.timestamp(),
+            'sync_failed': cs_refresh.last_error is not None,
+            'newest_date': newest_date.strftime('%Y-%m-%d') if newest_date is not None else None}
+
+# App layout (built per page load from whatever snapshot is current)
+def serve_layout():
+    snapshot = cs_refresh.get_snapshot()
+    oldest_date, newest_date = cs_refresh.date_range(snapshot)
+    return html.Div([
         html.Div([
-            dcc.Graph(id="mb_time_to_triage", style={'height': 100}),
-            dcc.Graph(id="mb_time_to_resolved", style={'height': 100})
-        ], style={'display': 'inline-block', 'width':'25%'}),
+            html.H1(children='Metrics'),
+            html.Div(id='last-refresh', children=cs_refresh.describe_staleness(snapshot)),
+            dcc.Interval(id='refresh-interval', interval=30 * 1000),
+            dcc.Store(id='data-version', data=snapshot.version),
+            dcc.Store(id='refresh-info', data=refresh_info(snapshot)),
+            dcc.Store(id='chart-data'),
+            dcc.Store(id='chart-style', data=chart_style),
+            html.Div([
+                html.A(id='export-link', href='', children=[html.Button(id="btn_csv", children=["Download ", html.I(className="fa fa-download")],className="button")]),
+                dcc.RadioItems(id='export-format', value='csv', inline=True,
+                               options=[{'label': ' CSV', 'value': 'csv'},
+                                        {'label': ' CSV (gzip)', 'value': 'csv.gz'},
+                                        {'label': ' Parquet', 'value': 'parquet', 'disabled': not parquet_available()}])
+            ]),
+            dcc.Dropdown(id='cid-selector', options=tenant_options(snapshot), value=[], multi=True,
+                         placeholder='All tenants', style={'minWidth': 250}),
+            dcc.DatePickerRange(
+                id='date-picker-range',
+                start_date=oldest_date,
+                end_date=newest_date
+            ),
+        ], style={'width': '100%', 'display': 'flex', 'justify-content': 'space-between', 'align-items': 'center'}),
         html.Div([
-            dcc.Graph(id="os_time_to_triage", style={'height': 100}),
-            dcc.Graph(id="os_time_to_resolved", style={'height': 100})
-        ], style={'display': 'inline-block', 'width':'25%'}),
+                dash_table.DataTable(
+                    id='table',
+                    css=[{'selector': 'table', 'rule': 'table-layout: fixed'}],
+                    data=[],
+                    style_cell={
+                        'textOverflow': 'ellipsis',
+                        'overflow': 'hidden'
+                    },
+                    columns=table_columns,
+                    page_current=0,
+                    page_size=5,
+                    page_action='custom',
+                    sort_action='custom',
+                    sort_mode='multi',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query='',
+                    tooltip_data=[],
+                    tooltip_duration=None
+                ),
+                html.Details([
+                    html.Summary('Selected alert (click a row)'),
+                    html.Pre(id='alert-details', style={'maxHeight': 300, 'overflow': 'auto'})
+                ])
+            ], style={'width':'100%', 'display': 'inline-block', 'border': '1px solid red', 'padding': '10px', 'box-sizing': 'border-box'}),
+        html.Div(id='analyst-indicators', children=[], style={'width': '100%', 'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box'}),
         html.Div([
-            dcc.Graph(id="kb_time_to_triage", style={'height': 100}),
-            dcc.Graph(id="kb_time_to_resolved", style={'height': 100})
-        ], style={'display': 'inline-block', 'width':'25%'})
-    ], style={'width': '100%', 'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box'}),
-    html.Div([
-        html.Div([
-            dcc.Graph(id='bar-plot', style={'height': 425})
-        ], style={'width': '50%', 'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box'}),
-        html.Div([
-            dcc.Graph(id="pie_status", style={'height': 425})
-        ], style={'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box', 'width':'25%'}),
-        html.Div([
-            dcc.Graph(id="pie_assigned", style={'height': 425})
-        ], style={'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box', 'width':'25%'}),
-    ], style={'width': '100%', 'display': 'inline-block'})
+            html.Div([
+                dcc.Graph(id='bar-plot', style={'height': 425})
+            ], style={'width': '50%', 'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box'}),
+            html.Div([
+                dcc.Graph(id="pie_status", style={'height': 425})
+            ], style={'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box', 'width':'25%'}),
+            html.Div([
+                dcc.Graph(id="pie_assigned", style={'height': 425})
+            ], style={'display': 'inline-block', 'border': '1px solid red', 'box-sizing': 'border-box', 'width':'25%'}),
+        ], style={'width': '100%', 'display': 'inline-block'})
         
-])
+    ])
+
+app.layout = serve_layout
+
+# Key cached callback results by the content of the dataset being served
+def dataset_version():
+    return cs_refresh.get_snapshot().fingerprint
+
+# Hit/miss counters for sizing the callback cache
+@app.server.route('/cache-stats')
+def cache_stats():
+    return flask.jsonify(cs_cache.stats())
+
+# Bytes sent back for every Dash callback, labelled by the outputs it updates
+@app.server.after_request
+def record_callback_payload(response):
+    if flask.request.path.endswith('_dash-update-component'):
+        body = flask.request.get_json(silent=True) or {}
+        cs_telemetry.observe_payload(body.get('output', 'unknown'), response.calculate_content_length() or 0)
+    return response
+
+# Prometheus-style metrics: stage timings, row counts, callback timings and payload sizes, cache and snapshot state
+@app.server.route('/metrics')
+def metrics():
+    snapshot = cs_refresh.get_snapshot()
+    cs_telemetry.set_gauge('cs_snapshot_rows', cs_refresh.row_count(snapshot), help_text='Alerts in the partitions being served')
+    cs_telemetry.set_gauge('cs_snapshot_version', snapshot.version, help_text='Frames swapped in since startup')
+    if snapshot.refreshed_at is not None:
+        cs_telemetry.set_gauge('cs_snapshot_age_seconds', (datetime.now() - snapshot.refreshed_at).total_seconds(),
+                               help_text='Seconds since the served frame was built')
+    for key, value in cs_cache.stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cs_telemetry.set_gauge(f'cs_callback_cache_{key}', value, help_text=f'Callback cache {key}')
+    return flask.Response(cs_telemetry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.callback(
-    [Output('table', 'data'), 
-     Output('bar-plot', 'figure'), 
-     Output('pie_status', 'figure'), 
-     Output('pie_assigned', 'figure'), 
-     Output('sc_time_to_triage', 'figure'),
-     Output('sc_time_to_resolved', 'figure'),
-     Output('mb_time_to_triage', 'figure'),
-     Output('mb_time_to_resolved', 'figure'),
-     Output('os_time_to_triage', 'figure'),
-     Output('os_time_to_resolved', 'figure'),
-     Output('kb_time_to_triage', 'figure'),
-     Output('kb_time_to_resolved', 'figure'),
-     Output('stored-data', 'data')],
-    [Input('date-picker-range', 'start_date'), Input('date-picker-range', 'end_date')]
+    [Output('refresh-info', 'data'),
+     Output('data-version', 'data'),
+     Output('date-picker-range', 'start_date'),
+     Output('date-picker-range', 'end_date'),
+     Output('cid-selector', 'options')],
+    [Input('refresh-interval', 'n_intervals')],
+    [State('refresh-info', 'data'),
+     State('data-version', 'data'),
+     State('date-picker-range', 'start_date'),
+     State('date-picker-range', 'end_date')]
 )
-def update_table(start_date, end_date):
-    if start_date is not None and end_date is not None:
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
-        # Filter the DataFrame based on the selected date range
-        filtered_data = data[(data['created_timestamp'] >= start_date) & (data['created_timestamp'] <= end_date)]
-
-        total_sc_detections = filtered_data['assigned_to_name'].value_counts().get('Steven Caraballo', 0)
-        total_mb_detections = filtered_data['assigned_to_name'].value_counts().get('Mathew Benitez', 0)
-        total_os_detections = filtered_data['assigned_to_name'].value_counts().get('Omar Santiago', 0)
-        total_kb_detections = filtered_data['assigned_to_name'].value_counts().get('Keith Blackler', 0)
-
-        table_data = filtered_data.to_dict('records')
-
-        # Create the bar plot
-        counts = filtered_data.pivot_table(index='assigned_to_name', columns='severity_name', aggfunc='size', fill_value=0).reset_index()
-        fig = go.Figure()
-
-        # Define the order and colors for the legend
-        detection_order = ['Informational','Low', 'Medium', 'High', 'Critical']
-        colors = {
-            'Critical': 'red',
-            'High': '#ff8200',
-            'Medium': '#ffc000',
-            'Low': '#04AA6D',
-            'Informational': 'blue'
-        }
-
-        # Add traces in the specified order
-        for detection_type in detection_order:
-            if detection_type in counts.columns:
-                fig.add_trace(go.Bar(
-                    x=counts['assigned_to_name'],
-                    y=counts[detection_type],
-                    name=detection_type,
-                    marker=dict(color=colors[detection_type]),
-                    text=counts[detection_type],  # Set the text to display on each bar
-                    textposition='auto'  # Position the text automatically
-                ))
-                
-        fig.update_layout(
-            barmode='stack',
-            title='Detections Closed Out Per User',
-            xaxis_title='User',
-            yaxis_title='Count'
-        )
-        pie_status_colors = {
-            'new': 'red',       
-            'in_progress': '#ffc000',     
-            'closed': '#04AA6D' 
-        }
-        status_counts = filtered_data['status'].value_counts(normalize=True) * 100
-        pie_status = px.pie(values=status_counts.values,
-                      names=status_counts.index, 
-                      hole=.3,
-                      title='Status Percentage',
-                      color=status_counts.index,
-                      color_discrete_map=pie_status_colors   # Map the colors
-                      )
-        
-        analyst_name_mapping = {'Steven Caraballo':'SC','Mathew Benitez':'MB','Omar Santiago':'OS','Keith Blackler':'KB'}
-        pie_assigned_colors = {
-            'Steven Caraballo': '#04AA6D',   # Red
-            'Mathew Benitez': '#ffc000',   # Green
-            'Omar Santiago': '#ff8200',    # Blue
-            'Keith Blackler':'red'
-        }
-        pie_assigned_legend_order = ['Steven Caraballo', 'Mathew Benitez', 'Omar Santiago', 'Keith Blackler']
-        status_counts2 = filtered_data['assigned_to_name'].value_counts(normalize=True) * 100
-
-        status_counts_df = status_counts2.reset_index()
-        status_counts_df.columns = ['assigned_to_name', 'percentage']
-
-        pie_assigned = px.pie(
-                      status_counts_df,
-                      values='percentage',
-                      names='assigned_to_name', 
-                      hole=.3,
-                      title='Assigned Percentage',
-                      color='assigned_to_name',
-                      color_discrete_map=pie_assigned_colors,
-                      category_orders={'assigned_to_name': pie_assigned_legend_order}  # Specify legend order
-                      )
-
-        #STEVE TIME TO TRIAGED
-        total_seconds_to_triaged_sc = filtered_data[filtered_data['assigned_to_name'] == 'Steven Caraballo']['seconds_to_triaged'].sum()
-        total_hours_to_triaged_sc = (total_seconds_to_triaged_sc / total_sc_detections) / 3600
-        total_minutes_to_triaged_sc = (total_seconds_to_triaged_sc / total_sc_detections) / 60
-        total_days_to_triaged_sc = (total_seconds_to_triaged_sc / total_sc_detections) / 86400
-
-        if total_hours_to_triaged_sc >= 1 and total_hours_to_triaged_sc < 24:
-            sc_ttt = {'data': [go.Indicator(mode="number", value=round(total_hours_to_triaged_sc, 2),title={"text": "Total Time to Triaged for Steven"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_triaged_sc >= 24:
-            sc_ttt = {'data': [go.Indicator(mode="number", value=round(total_days_to_triaged_sc, 2),title={"text": "Total Time to Triaged for Steven"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            sc_ttt = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_triaged_sc, 2),title={"text": "Total Time to Triaged for Steven"},number={"suffix": " Mins","font": {"size": 48}})]}            
-
-        #STEVE TIME TO RESOLVED
-        total_seconds_to_resolved_sc = filtered_data[filtered_data['assigned_to_name'] == 'Steven Caraballo']['seconds_to_resolved'].sum()
-        total_hours_to_resolved_sc = (total_seconds_to_resolved_sc / total_sc_detections) / 3600
-        total_minutes_to_resolved_sc = (total_seconds_to_resolved_sc / total_sc_detections) / 60
-        total_days_to_resolved_sc = (total_seconds_to_resolved_sc / total_sc_detections) / 86400
-
-        if total_hours_to_resolved_sc >= 1 and total_hours_to_resolved_sc < 24:
-            sc_ttr = {'data': [go.Indicator(mode="number", value=round(total_hours_to_resolved_sc, 2),title={"text": "Total Time to Resolved for Steven"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_resolved_sc >= 24:
-            sc_ttr = {'data': [go.Indicator(mode="number", value=round(total_days_to_resolved_sc, 2),title={"text": "Total Time to Resolved for Steven"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            sc_ttr = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_resolved_sc, 2),title={"text": "Total Time to Resolved for Steven"},number={"suffix": " Mins","font": {"size": 48}})]}
-
-        #MATT TIME TO TRIAGED
-        total_seconds_to_triaged_mb = filtered_data[filtered_data['assigned_to_name'] == 'Mathew Benitez']['seconds_to_triaged'].sum()
-        total_hours_to_triaged_mb = (total_seconds_to_triaged_mb / total_mb_detections) / 3600
-        total_minutes_to_triaged_mb = (total_seconds_to_triaged_mb / total_mb_detections) / 60
-        total_days_to_triaged_mb = (total_seconds_to_triaged_mb / total_mb_detections) / 86400
-
-        if total_hours_to_triaged_mb >= 1 and total_hours_to_triaged_mb < 24:
-            mb_ttt = {'data': [go.Indicator(mode="number", value=round(total_hours_to_triaged_mb, 2),title={"text": "Total Time to Triaged for Matt"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_triaged_mb >= 24:
-            mb_ttt = {'data': [go.Indicator(mode="number", value=round(total_days_to_triaged_mb, 2),title={"text": "Total Time to Triaged for Matt"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            mb_ttt = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_triaged_mb, 2),title={"text": "Total Time to Triaged for Matt"},number={"suffix": " Mins","font": {"size": 48}})]}
-
-        #MATT TIME TO RESOLVED
-        total_seconds_to_resolved_mb = filtered_data[filtered_data['assigned_to_name'] == 'Mathew Benitez']['seconds_to_resolved'].sum()
-        total_hours_to_resolved_mb = (total_seconds_to_resolved_mb / total_mb_detections) / 3600
-        total_minutes_to_resolved_mb = (total_seconds_to_resolved_mb / total_mb_detections) / 60
-        total_days_to_resolved_mb = (total_seconds_to_resolved_mb / total_mb_detections) / 86400
-
-        if total_hours_to_resolved_mb >= 1 and total_hours_to_resolved_mb < 24:
-            mb_ttr = {'data': [go.Indicator(mode="number", value=round(total_hours_to_resolved_mb, 2),title={"text": "Total Time to Resolved for Matt"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_resolved_mb >= 24:
-            mb_ttr = {'data': [go.Indicator(mode="number", value=round(total_days_to_resolved_mb, 2),title={"text": "Total Time to Resolved for Matt"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            mb_ttr = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_resolved_mb, 2),title={"text": "Total Time to Resolved for Matt"},number={"suffix": " Mins","font": {"size": 48}})]}
-
-        #OMAR TIME TO TRIAGED
-        total_seconds_to_triaged_os = filtered_data[filtered_data['assigned_to_name'] == 'Omar Santiago']['seconds_to_triaged'].sum()
-        total_hours_to_triaged_os = (total_seconds_to_triaged_os / total_os_detections) / 3600
-        total_minutes_to_triaged_os = (total_seconds_to_triaged_os / total_os_detections) / 60
-        total_days_to_triaged_os = (total_seconds_to_triaged_os / total_os_detections) / 86400
-
-        if total_hours_to_triaged_os >= 1 and total_hours_to_triaged_os < 24:
-            os_ttt = {'data': [go.Indicator(mode="number", value=round(total_hours_to_triaged_os, 2),title={"text": "Total Time to Triaged for Omar"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_triaged_os >= 24:
-            os_ttt = {'data': [go.Indicator(mode="number", value=round(total_days_to_triaged_os, 2),title={"text": "Total Time to Triaged for Omar"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            os_ttt = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_triaged_os, 2),title={"text": "Total Time to Triaged for Omar"},number={"suffix": " Mins","font": {"size": 48}})]}
-
-        #OMAR TIME TO RESOLVED
-        total_seconds_to_resolved_os = filtered_data[filtered_data['assigned_to_name'] == 'Omar Santiago']['seconds_to_resolved'].sum()
-        total_hours_to_resolved_os = (total_seconds_to_resolved_os / total_os_detections) / 3600
-        total_minutes_to_resolved_os = (total_seconds_to_resolved_os / total_os_detections) / 60
-        total_days_to_resolved_os = (total_seconds_to_resolved_os / total_os_detections) / 86400
-
-        if total_hours_to_resolved_os >= 1 and total_hours_to_resolved_os < 24:
-            os_ttr = {'data': [go.Indicator(mode="number", value=round(total_hours_to_resolved_os, 2),title={"text": "Total Time to Resolved for Omar"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_resolved_os >= 24:
-            os_ttr = {'data': [go.Indicator(mode="number", value=round(total_days_to_resolved_os, 2),title={"text": "Total Time to Resolved for Omar"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            os_ttr = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_resolved_os, 2),title={"text": "Total Time to Resolved for Omar"},number={"suffix": " Mins","font": {"size": 48}})]}
-
-        #KEITH TIME TO TRIAGED
-        total_seconds_to_triaged_kb = filtered_data[filtered_data['assigned_to_name'] == 'Keith Blackler']['seconds_to_triaged'].sum()
-        total_hours_to_triaged_kb = (total_seconds_to_triaged_kb / total_kb_detections) / 3600
-        total_minutes_to_triaged_kb = (total_seconds_to_triaged_kb / total_kb_detections) / 60
-        total_days_to_triaged_kb = (total_seconds_to_triaged_kb / total_kb_detections) / 86400
-
-        if total_hours_to_triaged_kb >= 1 and total_hours_to_triaged_kb < 24:
-            kb_ttt = {'data': [go.Indicator(mode="number", value=round(total_hours_to_triaged_kb, 2),title={"text": "Total Time to Triaged for Keith"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_triaged_kb >= 24:
-            kb_ttt = {'data': [go.Indicator(mode="number", value=round(total_days_to_triaged_kb, 2),title={"text": "Total Time to Triaged for Keith"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            kb_ttt = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_triaged_kb, 2),title={"text": "Total Time to Triaged for Keith"},number={"suffix": " Mins","font": {"size": 48}})]}
-
-        #KEITH TIME TO RESOLVED
-        total_seconds_to_resolved_kb = filtered_data[filtered_data['assigned_to_name'] == 'Keith Blackler']['seconds_to_resolved'].sum()
-        total_hours_to_resolved_kb = (total_seconds_to_resolved_kb / total_kb_detections) / 3600
-        total_minutes_to_resolved_kb = (total_seconds_to_resolved_kb / total_kb_detections) / 60
-        total_days_to_resolved_kb = (total_seconds_to_resolved_kb / total_kb_detections) / 86400
-
-        if total_hours_to_resolved_kb >= 1 and total_hours_to_resolved_kb < 24:
-            kb_ttr = {'data': [go.Indicator(mode="number", value=round(total_hours_to_resolved_kb, 2),title={"text": "Total Time to Resolved for Keith"},number={"suffix": " Hrs","font": {"size": 48}})]}
-        elif total_hours_to_resolved_kb >= 24:
-            kb_ttr = {'data': [go.Indicator(mode="number", value=round(total_days_to_resolved_kb, 2),title={"text": "Total Time to Resolved for Keith"},number={"suffix": " Days","font": {"size": 48}})]}
-        else:
-            kb_ttr = {'data': [go.Indicator(mode="number", value=round(total_minutes_to_resolved_kb, 2),title={"text": "Total Time to Resolved for Keith"},number={"suffix": " Mins","font": {"size": 48}})]}
-
-
-        return table_data, fig, pie_status, pie_assigned, sc_ttt, sc_ttr, mb_ttt, mb_ttr, os_ttt, os_ttr, kb_ttt, kb_ttr, filtered_data.to_dict(orient='records')
-    
-    # Return the unfiltered data and an empty figure if no dates are selected
-    return data.to_dict('records'), go.Figure()
-
-@callback([
-    Output("download-csv", "data")],
-    [Input("btn_csv", "n_clicks"),
-     State('stored-data', 'data')],
-    prevent_initial_call=True
+@instrument_callback('update_refresh_status')
+def update_refresh_status(n_intervals, current_info, current_version, start_date, end_date):
+    snapshot = cs_refresh.get_snapshot()
+    info = refresh_info(snapshot)
+    new_info = info if info != current_info else dash.no_update
+    # only touch data-version when a new frame was swapped in, so the charts re-render once per refresh
+    if snapshot.version == current_version:
+        return new_info, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    new_start_date = new_end_date = dash.no_update
+    oldest_date, newest_date = cs_refresh.date_range(snapshot)
+    if newest_date is not None:
+        if start_date is None or end_date is None:
+            # a page opened before the first data arrived has no date range yet
+            new_start_date, new_end_date = oldest_date, newest_date
+        elif str(end_date)[:10] == (current_info or {}).get('newest_date'):
+            # a range that ended on the newest alert keeps following the newest alert
+            new_end_date = newest_date
+    return new_info, snapshot.version, new_start_date, new_end_date, tenant_options(snapshot)
+
+# The staleness label ticks in the browser; the server only sends refresh-info when a refresh happened
+app.clientside_callback(
+    ClientsideFunction(namespace='cs_dashboard', function_name='staleness'),
+    Output('last-refresh', 'children'),
+    [Input('refresh-interval', 'n_intervals'), Input('refresh-info', 'data')]
 )
-def func(n_clicks, stored_data):
-    if n_clicks is None:
+
+@app.callback(
+    [Output('table', 'data'),
+     Output('table', 'page_current'),
+     Output('table', 'page_count'),
+     Output('table', 'tooltip_data')],
+    [Input('table', 'page_current'),
+     Input('table', 'page_size'),
+     Input('table', 'sort_by'),
+     Input('table', 'filter_query'),
+     Input('date-picker-range', 'start_date'),
+     Input('date-picker-range', 'end_date'),
+     Input('cid-selector', 'value'),
+     Input('data-version', 'data')]
+)
+@instrument_callback('update_table_page')
+def update_table_page(page_current, page_size, sort_by, filter_query, start_date, end_date, cids, version):
+    if start_date is None or end_date is None:
+        raise PreventUpdate
+    return build_table_page(page_current, page_size, sort_by, filter_query, start_date, end_date, sorted(cids or []))
+
+#ONE PAGE OF THE TABLE AND ITS TOOLTIPS, CACHED PER DATASET VERSION
+@cs_cache.memoize(version=dataset_version)
+def build_table_page(page_current, page_size, sort_by, filter_query, start_date, end_date, cids):
+    # only the partitions of the selected tenants are filtered, sorted and paged
+    data = cs_refresh.select_tenants(cs_refresh.get_snapshot(), cids, start_date, end_date)
+    # only the visible page is sent to the browser; sort and filter run here on the full range
+    columns = [col['id'] for col in table_columns]
+    # composite_id rides along (not displayed) so a clicked row can be looked up in the store
+    page, page_current, page_count = query_page(data, page_current, page_size, sort_by, filter_query,
+                                                columns + ['composite_id'])
+    return page.to_dict('records'), page_current, page_count, page_tooltips(page[columns])
+
+#FULL API PAYLOAD OF THE CLICKED ALERT, READ FROM THE LOCAL STORE ONLY WHEN ASKED FOR
+@app.callback(
+    Output('alert-details', 'children'),
+    [Input('table', 'active_cell')],
+    [State('table', 'data')]
+)
+@instrument_callback('show_alert_details')
+def show_alert_details(active_cell, page_data):
+    if not active_cell or not page_data or active_cell['row'] >= len(page_data):
         raise PreventUpdate
-    
-    # Retrieve DataFrame from stored data
-    df_dict = pd.DataFrame.from_records(stored_data)
+    alerts = get_alerts([page_data[active_cell['row']].get('composite_id')])
+    if not alerts:
+        return 'Alert not found in the local store'
+    return json.dumps(alerts[0], indent=2)
+
+#A FORMATTED DURATION FOR AN INDICATOR TITLE ("–" WHEN THERE IS NONE)
+def duration_text(seconds):
+    value, suffix = format_duration(seconds)
+    return '–' if value is None else f'{value}{suffix}'
+
+#ONE TIME-TO-TRIAGED/RESOLVED INDICATOR FOR ONE ANALYST
+def duration_indicator(stats, analyst, column, label):
+    first_name = str(analyst).split(' ')[0]
+    title = f"Total Time to {label} for {first_name}"
+    if not stats.loc[analyst, ('count', column)]:
+        # none of the analyst's alerts has this duration yet (e.g. all still open), so there is nothing to average
+        return {'data': [],
+                'layout': {'title': {'text': f"{title}<br><span style='font-size:0.7em'>no {label.lower()} alerts</span>",
+                                     'x': 0.5},
+                           'annotations': [{'text': '–', 'showarrow': False, 'font': {'size': 48},
+                                            'xref': 'paper', 'yref': 'paper', 'x': 0.5, 'y': 0.5}],
+                           'xaxis': {'visible': False}, 'yaxis': {'visible': False}}}
+    value, suffix = format_duration(stats.loc[analyst, ('mean', column)])
+    title += (f"<br><span style='font-size:0.7em'>median {duration_text(stats.loc[analyst, ('median', column)])}"
+              f" · p90 {duration_text(stats.loc[analyst, ('p90', column)])}</span>")
+    return {'data': [go.Indicator(mode="number", value=value, title={"text": title}, number={"suffix": suffix, "font": {"size": 48}})]}
+
+#A COLUMN OF INDICATORS FOR EVERY ANALYST IN THE SELECTED RANGE
+def analyst_indicators(data):
+    stats = analyst_metrics(data)
+    width = f'{100 / max(len(stats.index), 1)}%'
+    return [
+        html.Div([
+            dcc.Graph(figure=duration_indicator(stats, analyst, column, label), style={'height': 100})
+            for column, label in duration_metrics.items()
+        ], style={'display': 'inline-block', 'width': width})
+        for analyst in stats.index
+    ]
+
+#DAY BUCKETS AS COLUMNS, EVERY KEY AS ITS DISTINCT VALUES AND ONE CODE PER BUCKET (DAYS AS YYYY-MM-DD)
+def encode_day_counts(counts):
+    encoded = {'alerts': counts['alerts'].astype(int).tolist()}
+    for key in counts.columns.drop('alerts'):
+        column = counts[key].dt.strftime('%Y-%m-%d') if key == 'day' else counts[key]
+        codes, values = pd.factorize(column)
+        encoded[key] = {'values': [str(value) for value in values], 'codes': codes.tolist()}
+    return encoded
+
+#EVERY DAY BUCKET THE BAR PLOT AND THE PIES ARE SUMMED FROM, CACHED PER DATASET VERSION
+@cs_cache.memoize(version=dataset_version)
+def build_chart_data(cids):
+    rollup = cs_refresh.select_rollup(cs_refresh.get_snapshot(), cids)
+    with timed('chart_data'):
+        return {name: encode_day_counts(day_counts(rollup, keys)) for name, keys in chart_keys.items()}
+
+# Only a new frame or another tenant selection needs the server; the charts of every date range are
+# summed from these buckets in the browser
+@app.callback(Output('chart-data', 'data'),
+              [Input('cid-selector', 'value'),
+               Input('data-version', 'data')])
+@instrument_callback('update_chart_data')
+def update_chart_data(cids, version):
+    return build_chart_data(sorted(cids or []))
+
+for chart_id, function_name in [('bar-plot', 'bar_plot'), ('pie_status', 'status_pie'), ('pie_assigned', 'assigned_pie')]:
+    app.clientside_callback(
+        ClientsideFunction(namespace='cs_dashboard', function_name=function_name),
+        Output(chart_id, 'figure'),
+        [Input('date-picker-range', 'start_date'),
+         Input('date-picker-range', 'end_date'),
+         Input('chart-data', 'data')],
+        [State('chart-style', 'data')]
+    )
+
+#TIME-TO-TRIAGED/RESOLVED INDICATORS OF EVERY ANALYST, CACHED PER DATASET VERSION
+@cs_cache.memoize(version=dataset_version)
+def build_analyst_indicators(start_date, end_date, cids):
+    # median and p90 are taken from the selected alerts themselves, so they are exact
+    data = cs_refresh.select_tenants(cs_refresh.get_snapshot(), cids, start_date, end_date)
+    with timed('figure_indicators'):
+        return analyst_indicators(data)
+
+# The duration quantiles need the alerts themselves, so the indicators are still built on the server
+# (nothing to draw until a date range is selected, e.g. while the first fetch is still running)
+@app.callback(
+    Output('analyst-indicators', 'children'),
+    [Input('date-picker-range', 'start_date'),
+     Input('date-picker-range', 'end_date'),
+     Input('cid-selector', 'value'),
+     Input('data-version', 'data')]
+)
+@instrument_callback('update_analyst_indicators')
+def update_analyst_indicators(start_date, end_date, cids, version):
+    if start_date is None or end_date is None:
+        raise PreventUpdate
+    return build_analyst_indicators(start_date, end_date, sorted(cids or []))
+
+# The export URL is only string building, so it is put together in the browser
+app.clientside_callback(
+    ClientsideFunction(namespace='cs_dashboard', function_name='export_link'),
+    Output('export-link', 'href'),
+    [Input('date-picker-range', 'start_date'),
+     Input('date-picker-range', 'end_date'),
+     Input('cid-selector', 'value'),
+     Input('export-format', 'value')]
+)
 
-    return [dcc.send_data_frame(df_dict.to_csv, "some_name.csv")]
+# Stream every field of the alerts of a date range (and of the selected tenants) as CSV, gzipped CSV or Parquet
+@app.server.route('/export')
+def export_alerts():
+    args = flask.request.args
+    export_format = args.get('format', 'csv')
+    if export_format not in export_formats or (export_format == 'parquet' and not parquet_available()):
+        return flask.Response(f'unsupported export format {export_format!r}', status=400)
+    start_date, end_date = args.get('start_date'), args.get('end_date')
+    if bool(start_date) != bool(end_date):
+        return flask.Response('give both start_date and end_date, or neither', status=400)
+    first_day = last_day = 'all'
+    if start_date:
+        try:
+            start_day, end_day = date_bounds(start_date, end_date)
+            # the name is built from the parsed days, never from the raw query string
+            first_day = start_day.strftime('%Y-%m-%d')
+            last_day = (end_day - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        except (ValueError, OverflowError):
+            return flask.Response('start_date and end_date must be dates', status=400)
+    # only the partitions of the selected tenants are read
+    data = cs_refresh.select_tenants(cs_refresh.get_snapshot(), args.getlist('cid'), start_date or None, end_date or None)
+    # every field of the selected alerts, not only the columns the dashboard keeps
+    with timed('export_frame'):
+        data = export_frame(data)
+    extension, mimetype = export_formats[export_format]
+    filename = f"alerts_{first_day}_{last_day}.{extension}"
+    return flask.Response(flask.stream_with_context(export_chunks(data, export_format)), mimetype=mimetype,
+                          headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 # Run the app
 if __name__ == '__main__':
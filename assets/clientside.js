@@ -0,0 +1,129 @@
+// Callbacks cheap enough to run in the browser, so they never wait on (or load) the server
+(function() {
+    // Alerts of the buckets inside the picked dates, summed per value of each key (keys[0] -> keys[1] -> total).
+    // Same days as cs_table.date_bounds: both end days are included in full
+    function sum_days(chart, start_date, end_date, keys) {
+        var first_day = start_date.slice(0, 10);
+        var last_day = end_date.slice(0, 10);
+        var totals = {};
+        chart.alerts.forEach(function(alerts, i) {
+            var day = chart.day.values[chart.day.codes[i]];
+            if (day < first_day || day > last_day) {
+                return;
+            }
+            var level = totals;
+            keys.forEach(function(key, k) {
+                var value = chart[key].values[chart[key].codes[i]];
+                if (k === keys.length - 1) {
+                    level[value] = (level[value] || 0) + alerts;
+                } else {
+                    level = level[value] = level[value] || {};
+                }
+            });
+        });
+        return totals;
+    }
+
+    // Percentage of alerts in each value, largest first (as cs_analytics.share used to return)
+    function share(totals) {
+        var labels = Object.keys(totals).sort(function(a, b) { return totals[b] - totals[a]; });
+        var sum = labels.reduce(function(total, label) { return total + totals[label]; }, 0);
+        return {labels: labels, values: labels.map(function(label) { return totals[label] / sum * 100; })};
+    }
+
+    // Donut of the given shares; values without a color of their own take the template's colorway
+    function pie(shares, colors, title, style) {
+        var colorway = style.template.layout.colorway || [];
+        var fallback = 0;
+        return {
+            data: [{
+                type: 'pie',
+                labels: shares.labels,
+                values: shares.values,
+                hole: 0.3,
+                marker: {colors: shares.labels.map(function(label) {
+                    return colors[label] || colorway[fallback++ % colorway.length];
+                })}
+            }],
+            layout: {template: style.template, title: {text: title}, legend: {tracegroupgap: 0}, margin: {t: 60}}
+        };
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        cs_dashboard: {
+            // Same text as cs_refresh.describe_staleness, ticking with the refresh interval
+            staleness: function(n_intervals, info) {
+                if (!info || !info.refreshed_at) {
+                    return 'Waiting for first refresh';
+                }
+                var age = Math.max(0, Math.floor(Date.now() / 1000 - info.refreshed_epoch));
+                var text = 'Last refresh: ' + info.refreshed_at + ' (' + Math.floor(age / 60) + ' min ' + (age % 60) + ' s ago)';
+                if (info.sync_failed) {
+                    text += ' - last sync failed, showing stored data';
+                }
+                return text;
+            },
+
+            // Export URL for the selected range and tenants; the file itself is only built when the link is followed
+            export_link: function(start_date, end_date, cids, export_format) {
+                if (!start_date || !end_date) {
+                    return '';
+                }
+                var query = new URLSearchParams({start_date: start_date, end_date: end_date, format: export_format});
+                (cids || []).forEach(function(cid) {
+                    query.append('cid', cid);
+                });
+                return '/export?' + query.toString();
+            },
+
+            // Alerts per analyst stacked by severity, re-summed from the day buckets on every date change
+            bar_plot: function(start_date, end_date, chart_data, style) {
+                if (!start_date || !end_date || !chart_data) {
+                    return window.dash_clientside.no_update;
+                }
+                var totals = sum_days(chart_data.severity, start_date, end_date, ['assigned_to_name', 'severity_name']);
+                var analysts = Object.keys(totals).sort();
+                var data = [];
+                style.severity_order.forEach(function(severity) {
+                    if (!analysts.some(function(analyst) { return severity in totals[analyst]; })) {
+                        return;
+                    }
+                    var counts = analysts.map(function(analyst) { return totals[analyst][severity] || 0; });
+                    data.push({type: 'bar', x: analysts, y: counts, name: severity, text: counts, textposition: 'auto',
+                               marker: {color: style.severity_colors[severity]}});
+                });
+                return {
+                    data: data,
+                    layout: {template: style.template, barmode: 'stack', title: {text: 'Detections Closed Out Per User'},
+                             xaxis: {title: {text: 'User'}}, yaxis: {title: {text: 'Count'}}}
+                };
+            },
+
+            status_pie: function(start_date, end_date, chart_data, style) {
+                if (!start_date || !end_date || !chart_data) {
+                    return window.dash_clientside.no_update;
+                }
+                var shares = share(sum_days(chart_data.status, start_date, end_date, ['status']));
+                return pie(shares, style.status_colors, 'Status Percentage', style);
+            },
+
+            // Analysts in the configured legend order first, then everyone else by share
+            assigned_pie: function(start_date, end_date, chart_data, style) {
+                if (!start_date || !end_date || !chart_data) {
+                    return window.dash_clientside.no_update;
+                }
+                var shares = share(sum_days(chart_data.assigned, start_date, end_date, ['assigned_to_name']));
+                var rank = function(label) {
+                    var position = style.assigned_legend_order.indexOf(label);
+                    return position < 0 ? style.assigned_legend_order.length : position;
+                };
+                var order = shares.labels.map(function(label, i) { return i; }).sort(function(a, b) {
+                    return rank(shares.labels[a]) - rank(shares.labels[b]) || a - b;
+                });
+                shares = {labels: order.map(function(i) { return shares.labels[i]; }),
+                          values: order.map(function(i) { return shares.values[i]; })};
+                return pie(shares, style.assigned_colors, 'Assigned Percentage', style);
+            }
+        }
+    });
+})();
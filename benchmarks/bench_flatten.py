@@ -0,0 +1,95 @@
+import sys
+import json
+import time
+import argparse
+import pandas as pd
+from cs_clean_data import to_local_time, flatten_alerts, frame_schema
+from benchmarks.generate_alerts import generate_alerts
+
+#USED IN THE LEGACY FLATTEN_DICT FUNCTION
+def flatten_value(value):
+    if isinstance(value, dict):
+        return ', '.join([f"{k}: {v}" for k, v in value.items()])
+    elif isinstance(value, list):
+        return ', '.join(map(str, value))
+    return value
+
+#THE ROW-BY-ROW FLATTEN_DICT THE DASHBOARD USED BEFORE flatten_alerts, KEPT AS IS AS THE PARITY REFERENCE
+def legacy_flatten_dict(d):
+    flattened = {}
+    for k, v in d.items():
+        if k == 'show_in_ui' and v == False:
+            None
+        else:
+            if isinstance(v, dict):
+                for k2, v2 in v.items():
+                    if isinstance(v2, dict):
+                        flattened.update(legacy_flatten_dict(v2))
+                    elif isinstance(v2, list):
+                        flattened[k2] = flatten_value(v2)
+                    else:
+                        flattened[k2] = flatten_value(v2)
+            # flattened[k] = flatten_value(v)
+            elif isinstance(v, list):
+                for i in range(0, len(v)):
+                    if isinstance(v[i], dict):
+                        for k2, v2 in v[i].items():
+                            if isinstance(v2, dict):
+                                flattened.update(legacy_flatten_dict(v2))
+                            elif isinstance(v2, list):
+                                flattened[k2 + f'{i}'] = flatten_value(v2)
+                            else:
+                                flattened[k2 + f'{i}'] = flatten_value(v2)
+                    else:
+                        flattened[k + f'{i}'] = v[i]
+                #flattened[k] = flatten_value(v)
+            else:
+                flattened[k] = v
+            if k == 'created_timestamp':
+                flattened[k] = to_local_time(v)
+    return flattened
+
+#THE ROW-BY-ROW PATH THE DASHBOARD USED BEFORE flatten_alerts
+def legacy_frame(alerts):
+    flattened_data = ([legacy_flatten_dict(row) for row in alerts if row.get('show_in_ui') != False])
+    data = pd.DataFrame(flattened_data)
+    data['created_timestamp'] = pd.to_datetime(data['created_timestamp'])
+    return data
+
+#BEST OF repeat RUNS, IN SECONDS
+def best_time(func, alerts, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(alerts)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the legacy flatten_dict with flatten_alerts (every column and only the '
+                                                 'dashboard schema) and check they build the same frame.')
+    parser.add_argument('--alerts', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    alerts = generate_alerts(args.alerts, seed=args.seed)
+    legacy_seconds, legacy = best_time(legacy_frame, alerts, args.repeat)
+    batch_seconds, batch = best_time(flatten_alerts, alerts, args.repeat)
+    columns = list(frame_schema)
+    pruned_seconds, pruned = best_time(lambda alerts: flatten_alerts(alerts, columns=columns), alerts, args.repeat)
+    # raises if a single column, value or row differs
+    pd.testing.assert_frame_equal(legacy, batch, check_dtype=False)
+    pd.testing.assert_frame_equal(legacy.reindex(columns=columns), pruned, check_dtype=False)
+
+    result = {'alerts': args.alerts, 'rows': len(batch), 'columns': len(batch.columns),
+              'legacy_seconds': round(legacy_seconds, 4), 'batch_seconds': round(batch_seconds, 4),
+              'speedup': round(legacy_seconds / batch_seconds, 2),
+              'pruned_columns': len(pruned.columns), 'pruned_seconds': round(pruned_seconds, 4),
+              'pruned_speedup': round(legacy_seconds / pruned_seconds, 2), 'parity': True}
+    json.dump(result, sys.stdout)
+    print()
+    return result
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import random
+import string
+from datetime import datetime, timedelta, timezone
+
+#VALUES THE SYNTHETIC ALERTS ARE DRAWN FROM
+analysts = [('Steven Caraballo', 'sc'), ('Mathew Benitez', 'mb'), ('Omar Santiago', 'os'), ('Keith Blackler', 'kb')]
+severities = [(10, 'Informational'), (30, 'Low'), (50, 'Medium'), (70, 'High'), (90, 'Critical')]
+statuses = ['new', 'in_progress', 'closed']
+os_versions = ['Windows 10', 'Windows 11', 'Windows Server 2019', 'Windows Server 2022', 'macOS Sonoma (14)', 'RHEL 9.2']
+tactics = [('Execution', 'TA0002', 'Command and Scripting Interpreter', 'T1059'),
+           ('Persistence', 'TA0003', 'Scheduled Task/Job', 'T1053'),
+           ('Credential Access', 'TA0006', 'OS Credential Dumping', 'T1003'),
+           ('Defense Evasion', 'TA0005', 'Masquerading', 'T1036'),
+           ('Machine Learning', 'CSTA0004', 'Sensor-based ML', 'CST0007')]
+tag_values = ['false_positive', 'true_positive', 'pentest', 'escalated', 'vip']
+
+def _hex(rng, length):
+    return ''.join(rng.choice('0123456789abcdef') for _ in range(length))
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + f'{moment.microsecond:06d}' + '000Z'
+
+#ONE ALERT SHAPED LIKE AN alerts/entities/alerts/v2 RESOURCE
+def generate_alert(rng, start, span_seconds, cids):
+    created = start + timedelta(seconds=rng.randint(0, span_seconds), microseconds=rng.randint(0, 999999))
+    updated = created + timedelta(seconds=rng.randint(0, 7 * 86400))
+    cid = rng.choice(cids)
+    agent_id = _hex(rng, 32)
+    severity, severity_name = rng.choice(severities)
+    tactic, tactic_id, technique, technique_id = rng.choice(tactics)
+    status = rng.choices(statuses, weights=[2, 1, 7])[0]
+    hostname = f"{rng.choice(['WS', 'LT', 'SRV'])}-{rng.randint(1, 400):04d}"
+    filename = rng.choice(['powershell.exe', 'cmd.exe', 'rundll32.exe', 'python3', 'mimikatz.exe', 'svchost.exe'])
+    alert = {
+        'composite_id': f'{cid}:ind:{agent_id}:{_hex(rng, 20)}',
+        'aggregate_id': f'aggind:{agent_id}:{rng.randint(10 ** 11, 10 ** 12)}',
+        'cid': cid,
+        'agent_id': agent_id,
+        'created_timestamp': _timestamp(created),
+        'updated_timestamp': _timestamp(updated),
+        'timestamp': _timestamp(created - timedelta(seconds=rng.randint(1, 120))),
+        'status': status,
+        'severity': severity,
+        'severity_name': severity_name,
+        'confidence': rng.choice([10, 50, 80, 100]),
+        'tactic': tactic,
+        'tactic_id': tactic_id,
+        'technique': technique,
+        'technique_id': technique_id,
+        'description': f'{technique} activity observed on {hostname}',
+        'display_name': f'{tactic} via {technique}',
+        'filename': filename,
+        'filepath': f'\\Device\\HarddiskVolume3\\Windows\\System32\\{filename}',
+        'cmdline': f'{filename} -' + ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 60))),
+        'sha256': _hex(rng, 64),
+        'md5': _hex(rng, 32),
+        'user_name': rng.choice(['administrator', 'svc_backup', 'jdoe', 'asmith', 'SYSTEM']),
+        'show_in_ui': rng.random() > 0.03,
+        'tags': rng.sample(tag_values, rng.randint(0, 2)),
+        'device': {
+            'device_id': agent_id,
+            'cid': cid,
+            'hostname': hostname,
+            'os_version': rng.choice(os_versions),
+            'platform_name': rng.choice(['Windows', 'Mac', 'Linux']),
+            'local_ip': f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+            'external_ip': f'203.0.113.{rng.randint(1, 254)}',
+            'mac_address': '-'.join(_hex(rng, 2) for _ in range(6)),
+            'machine_domain': 'corp.example.com',
+            'product_type_desc': rng.choice(['Workstation', 'Server']),
+            'groups': [_hex(rng, 32) for _ in range(rng.randint(0, 3))],
+            'tags': rng.sample(['SensorGroupingTags/prod', 'SensorGroupingTags/dev', 'FalconGroupingTags/pci'], rng.randint(0, 2)),
+            'system_manufacturer': rng.choice(['Dell Inc.', 'LENOVO', 'VMware, Inc.']),
+            'pod_labels': None,
+        },
+        'parent_details': {
+            'filename': 'explorer.exe',
+            'filepath': '\\Device\\HarddiskVolume3\\Windows\\explorer.exe',
+            'cmdline': 'C:\\Windows\\Explorer.EXE',
+            'sha256': _hex(rng, 64),
+            'md5': _hex(rng, 32),
+            'process_graph_id': f'pid:{agent_id}:{rng.randint(10 ** 9, 10 ** 10)}',
+        },
+        'mitre_attack': [{'pattern_id': rng.randint(1000, 60000), 'tactic': tactic, 'tactic_id': tactic_id,
+                          'technique': technique, 'technique_id': technique_id}],
+        'ioc_context': [{'ioc_type': 'hash_sha256', 'ioc_value': _hex(rng, 64), 'type': 'process',
+                         'cmdline': filename, 'md5': _hex(rng, 32)} for _ in range(rng.randint(0, 2))],
+        'pattern_disposition_details': {'detect': True, 'kill_process': rng.random() > 0.5, 'quarantine_file': False,
+                                        'operation_blocked': False, 'indicator': False},
+    }
+    if status != 'new' or rng.random() > 0.3:
+        analyst, uid = rng.choice(analysts)
+        alert['assigned_to_name'] = analyst
+        alert['assigned_to_uid'] = f'{uid}@example.com'
+        alert['seconds_to_triaged'] = int(rng.lognormvariate(8, 1.5))
+    if status == 'closed':
+        alert['seconds_to_resolved'] = alert.get('seconds_to_triaged', 0) + int(rng.lognormvariate(10, 1.5))
+        alert['comment'] = rng.choice(['Benign admin activity', 'Confirmed malicious, host isolated', 'Pentest'])
+    return alert
+
+#COUNT ALERTS SPREAD OVER THE DAYS BEFORE end (REPRODUCIBLE FOR A GIVEN SEED)
+def generate_alerts(count, seed=0, days=200, end=None, cids=('0123456789abcdef0123456789abcdef',)):
+    rng = random.Random(seed)
+    end = end or datetime(2026, 10, 1, tzinfo=timezone.utc)
+    start = end - timedelta(days=days)
+    return [generate_alert(rng, start, days * 86400, list(cids)) for _ in range(count)]
+
+if __name__ == '__main__':
+    import json
+    import sys
+    json.dump(generate_alerts(int(sys.argv[1]) if len(sys.argv) > 1 else 10), sys.stdout, indent=2)
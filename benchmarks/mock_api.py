@@ -0,0 +1,108 @@
+import re
+import json
+import time
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from benchmarks.generate_alerts import generate_alerts
+
+#TRUE WHEN AN ALERT'S cid IS THE MEMBER CID A TOKEN WAS ISSUED FOR (WHICH MAY BE GIVEN IN THE CONSOLE'S
+#UPPER CASE, WITH ITS -XX CHECKSUM SUFFIX)
+def same_cid(cid, member_cid):
+    return (cid or '').lower() == member_cid.lower().split('-')[0]
+
+#LOCAL STAND-IN FOR THE TOKEN, QUERY AND ENTITY ENDPOINTS cs_api.py CALLS
+class MockAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    alerts = {}
+    ids = []
+    latency = 0
+    max_limit = 10000
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('X-RateLimit-Limit', '6000')
+        self.send_header('X-RateLimit-Remaining', '5999')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def do_POST(self):
+        body = self._read_body()
+        time.sleep(self.latency)
+        path = urlparse(self.path).path
+        if path == '/oauth2/token':
+            # a member_cid token only sees that child CID's alerts, as with an MSSP parent's credentials
+            member_cid = parse_qs(body.decode()).get('member_cid', [''])[0]
+            return self._send(201, {'access_token': f'mock-token:{member_cid}', 'token_type': 'bearer', 'expires_in': 1799})
+        if path == '/alerts/entities/alerts/v2':
+            composite_ids = json.loads(body or b'{}').get('composite_ids', [])
+            member_cid = self._member_cid()
+            resources = [self.alerts[i] for i in composite_ids
+                         if i in self.alerts and (not member_cid or same_cid(self.alerts[i].get('cid'), member_cid))]
+            return self._send(200, {'meta': {}, 'resources': resources, 'errors': []})
+        self._send(404, {'errors': [{'code': 404, 'message': 'not found'}]})
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        if url.path != '/alerts/queries/alerts/v2':
+            return self._send(404, {'errors': [{'code': 404, 'message': 'not found'}]})
+        query = parse_qs(url.query)
+        limit = min(int(query.get('limit', ['100'])[0]), self.max_limit)
+        offset = int(query.get('after', query.get('offset', ['0']))[0])
+        ids = self._filtered_ids(query.get('filter', [''])[0])
+        page = ids[offset:offset + limit]
+        after = str(offset + len(page)) if offset + len(page) < len(ids) else ''
+        self._send(200, {'meta': {'pagination': {'offset': offset, 'limit': limit, 'total': len(ids), 'after': after}},
+                         'resources': page, 'errors': []})
+
+    #MEMBER CID THE BEARER TOKEN WAS ISSUED FOR ('' FOR THE CLIENT'S OWN CID)
+    def _member_cid(self):
+        return self.headers.get('Authorization', '').partition(':')[2]
+
+    #ONLY THE updated_timestamp FILTER cs_store.sync SENDS IS HONOURED; ANYTHING ELSE MATCHES EVERY ALERT
+    def _filtered_ids(self, fql_filter):
+        ids = self.ids
+        member_cid = self._member_cid()
+        if member_cid:
+            ids = [i for i in ids if same_cid(self.alerts[i].get('cid'), member_cid)]
+        match = re.search(r"updated_timestamp:>=?'([^']+)'", fql_filter)
+        if not match:
+            return ids
+        return [i for i in ids if self.alerts[i]['updated_timestamp'] >= match.group(1)]
+
+#SERVE alerts ON A FREE LOCAL PORT IN A BACKGROUND THREAD; RETURNS (SERVER, BASE URL)
+def start_mock_api(alerts, host='127.0.0.1', port=0, latency=0):
+    handler = type('BoundMockAPIHandler', (MockAPIHandler,), {
+        'alerts': {alert['composite_id']: alert for alert in alerts},
+        'ids': [alert['composite_id'] for alert in alerts],
+        'latency': latency,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mock-api', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve synthetic alerts on the endpoints cs_api.py uses.')
+    parser.add_argument('--alerts', type=int, default=10000)
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every response')
+    args = parser.parse_args()
+    server, base_url = start_mock_api(generate_alerts(args.alerts), port=args.port, latency=args.latency)
+    print(f'serving {args.alerts} alerts on {base_url} (set CS_API_BASE={base_url})')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
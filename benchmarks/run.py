@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import subprocess
+from datetime import datetime
+
+#BEST OF repeat RUNS OF func(), IN SECONDS, WITH THE LAST RESULT
+def best_time(func, repeat, setup=None):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#FETCH, FLATTEN, FRAME BUILD AND CALLBACK TIMINGS FOR ONE ALERT COUNT
+def run_size(size, repeat, seed):
+    import cs_api
+    import cs_cache
+    import cs_refresh
+    from cs_clean_data import build_frame
+    from benchmarks.bench_flatten import legacy_flatten_dict, legacy_frame
+    from benchmarks.generate_alerts import generate_alerts
+    from benchmarks.mock_api import start_mock_api
+
+    results = []
+    def record(scenario, seconds, **extra):
+        results.append(dict({'scenario': scenario, 'alerts': size, 'seconds': round(seconds, 6)}, **extra))
+        print(f'{scenario:<24} {size:>7} alerts  {seconds:9.4f} s', file=sys.stderr)
+
+    seconds, alerts = best_time(lambda: generate_alerts(size, seed=seed), 1)
+    record('generate', seconds)
+
+    server, base_url = start_mock_api(alerts)
+    cs_api.API_BASE = base_url
+    try:
+        seconds, fetched = best_time(lambda: cs_api.get_detection_data(cs_api.get_detections_list()), repeat)
+        record('fetch', seconds, rows=len(fetched))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    seconds, flattened = best_time(lambda: [legacy_flatten_dict(row) for row in alerts if row.get('show_in_ui') != False], repeat)
+    record('flatten_dict', seconds, rows=len(flattened))
+    seconds, frame = best_time(lambda: legacy_frame(alerts), repeat)
+    record('dataframe_legacy', seconds, rows=len(frame), columns=len(frame.columns))
+    seconds, frame = best_time(lambda: build_frame(alerts), repeat)
+    record('dataframe_build', seconds, rows=len(frame), columns=len(frame.columns),
+           memory_bytes=int(frame.memory_usage(deep=True).sum()))
+    seconds, snapshot = best_time(lambda: cs_refresh.publish(cs_refresh.split_tenants(frame)), repeat)
+    record('publish_rollup', seconds, buckets=sum(len(part.rollup.counts) for part in snapshot.partitions.values()))
+
+    try:
+        import app
+    except ImportError as e:
+        print(f'skipping update_table: {e}', file=sys.stderr)
+        return results
+    start_date = str(frame['created_timestamp'].min())
+    end_date = str(frame['created_timestamp'].max())
+    # every server callback a date change triggers; the bar plot and the pies are re-summed in the browser
+    # (scenario names kept as update_table for comparison with older results)
+    def update_table():
+        app.update_analyst_indicators(start_date, end_date, [], snapshot.version)
+        app.update_table_page(0, 5, [], '', start_date, end_date, [], snapshot.version)
+    # one untimed call so lazy imports are not counted as callback time
+    update_table()
+    seconds, _ = best_time(update_table, repeat, setup=cs_cache.invalidate)
+    record('update_table_cold', seconds)
+    seconds, _ = best_time(update_table, repeat)
+    record('update_table_warm', seconds)
+    # the day buckets the browser draws from, sent once per new frame or tenant selection
+    seconds, chart_data = best_time(lambda: app.update_chart_data([], snapshot.version), repeat, setup=cs_cache.invalidate)
+    record('chart_data', seconds, payload_bytes=len(json.dumps(chart_data)))
+    return results
+
+#SCENARIOS THAT GOT SLOWER THAN threshold TIMES THE BASELINE
+def compare(results, baseline, threshold):
+    previous = {(r['scenario'], r['alerts']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['scenario'], result['alerts']))
+        if not before:
+            continue
+        ratio = result['seconds'] / before
+        print(f"{result['scenario']:<24} {result['alerts']:>7} alerts  {before:9.4f} -> {result['seconds']:9.4f} s  x{ratio:.2f}",
+              file=sys.stderr)
+        if ratio > threshold and result['scenario'] != 'generate':
+            regressions.append(dict(result, baseline_seconds=before, ratio=round(ratio, 2)))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline dashboard benchmarks against synthetic alerts and a local mock API.')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma separated alert counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    # keep the store, snapshot and callback cache away from the real ones, and never sync in the background.
+    # Set unconditionally: a deployer's shell exporting these must not point the benchmark at production data
+    workdir = tempfile.mkdtemp(prefix='cs-bench-')
+    os.environ['CS_STORE_PATH'] = os.path.join(workdir, 'alerts.db')
+    os.environ['CS_SNAPSHOT_PATH'] = os.path.join(workdir, 'alerts_snapshot.pkl')
+    os.environ['CS_CACHE_PATH'] = ''
+    os.environ['CS_REFRESH_INTERVAL'] = '0'
+    os.environ['CS_MAX_REQUESTS_PER_SECOND'] = '0'
+    os.environ['CS_MEMBER_CIDS'] = ''
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(',')]:
+        results.extend(run_size(size, args.repeat, args.seed))
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'),
+              'git_revision': git_revision(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'cpu_count': os.cpu_count(),
+              'repeat': args.repeat,
+              'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'wrote {args.output}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s) over x{args.threshold}', file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
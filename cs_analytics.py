@@ -0,0 +1,57 @@
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+#DURATION COLUMNS SUMMARISED PER ANALYST AND THE LABEL USED FOR EACH
+duration_metrics = {'seconds_to_triaged': 'Triaged',
+                    'seconds_to_resolved': 'Resolved'}
+
+#FIELDS EVERY DAILY BUCKET IS SPLIT BY
+rollup_keys = ['day', 'tenant', 'assigned_to_name', 'severity_name', 'status']
+
+#ALERTS PER DAY FOR EVERY COMBINATION OF THE ROLLUP KEYS
+Rollup = namedtuple('Rollup', ['counts'])
+
+#BUILD THE ROLLUP INDEX FOR A FRESHLY LOADED FRAME
+def build_rollup(data):
+    keys = pd.DataFrame({'day': pd.to_datetime(data['created_timestamp']).dt.normalize()})
+    for key in rollup_keys[1:]:
+        keys[key] = data[key] if key in data.columns else pd.Series(np.nan, index=data.index, dtype=object)
+    counts = keys.groupby(rollup_keys, dropna=False, observed=True, sort=True).size().rename('alerts').reset_index()
+    return Rollup(counts)
+
+#ALERTS PER DAY FOR EVERY COMBINATION OF keys, SO THE BROWSER CAN RE-FILTER THE DATES ITSELF.
+#BUCKETS WITH A MISSING KEY ARE LEFT OUT, AS value_counts DOES
+def day_counts(rollup, keys):
+    totals = rollup.counts.groupby(['day'] + keys, observed=True)['alerts'].sum()
+    return totals[totals > 0].reset_index()
+
+#COUNT, MEAN, MEDIAN AND P90 OF EVERY DURATION FOR EVERY ANALYST, FROM THE SELECTED ALERTS THEMSELVES SO THE
+#QUANTILES ARE EXACT (COUNT IS HOW MANY ALERTS HAVE THE DURATION, alerts HOW MANY THE ANALYST HAS)
+def analyst_metrics(data):
+    columns = list(duration_metrics)
+    data = data.reindex(columns=['assigned_to_name'] + columns)
+    # computed in float64 even though the frame stores durations as float32
+    durations = data[columns].apply(pd.to_numeric, errors='coerce').astype('float64')
+    grouped = durations.groupby(data['assigned_to_name'], observed=True, sort=True)
+    stats = pd.concat({'count': grouped.count(),
+                       'mean': grouped.mean(),
+                       'median': grouped.median(),
+                       'p90': grouped.quantile(0.9)}, axis=1)
+    stats[('alerts', '')] = grouped.size()
+    return stats[stats[('alerts', '')] > 0]
+
+#PICK THE UNIT USED TO DISPLAY A DURATION (MINS UNDER AN HOUR, DAYS FROM 24 HOURS UP). A MISSING DURATION
+#(NO ALERT WITH ONE) HAS NO VALUE AND NO UNIT
+def format_duration(seconds):
+    if pd.isna(seconds):
+        return None, ''
+    hours = seconds / 3600
+    if hours >= 1 and hours < 24:
+        return round(hours, 2), ' Hrs'
+    elif hours >= 24:
+        return round(seconds / 86400, 2), ' Days'
+    return round(seconds / 60, 2), ' Mins'
+
+if __name__ == '__main__':
+    None
@@ -1,6 +1,13 @@
+import os
+import time
+import random
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pytz
+from cs_telemetry import timed, count_rows
 
 #GET LOCAL DATE
 dt_us_central = datetime.now(pytz.timezone('US/Eastern'))
@@ -8,29 +15,202 @@ new_york_date = dt_us_central.strftime("%d")
 new_york_month = dt_us_central.strftime("%m")
 new_york_year = dt_us_central.strftime("%Y")
 
-#GET ACCESS TOKEN
-def get_access_token():
-    data = {}
-    response = requests.post('https://api.crowdstrike.com/oauth2/token', data=data)
-    response_result = response.json()
-    access_token = response_result["access_token"]
-    return access_token
-
-#GET LIST OF DETECTIONS
-def get_detections_list(token):
-    headers = {'Content-Type': 'application/json', 'Authorization': 'bearer ' + token}
-    response = requests.get(f"https://api.crowdstrike.com/alerts/queries/alerts/v2?filter=created_timestamp:>'{new_york_year}-03-01T04:00:00.0Z'&limit=1000", headers=headers)
-    response_result = response.json()
-    detection_id_list = response_result["resources"]
+#FETCH SETTINGS
+API_BASE = os.environ.get('CS_API_BASE', 'https://api.crowdstrike.com')
+QUERY_LIMIT = int(os.environ.get('CS_QUERY_LIMIT', 1000))
+ENTITY_BATCH_SIZE = int(os.environ.get('CS_ENTITY_BATCH_SIZE', 500))
+MAX_WORKERS = int(os.environ.get('CS_MAX_WORKERS', 8))
+
+#MSSP CHILD CIDS FETCHED AS SEPARATE TENANTS (COMMA SEPARATED; EMPTY FETCHES THE API CLIENT'S OWN CID)
+MEMBER_CIDS = [cid.strip() for cid in os.environ.get('CS_MEMBER_CIDS', '').split(',') if cid.strip()]
+MAX_TENANT_WORKERS = int(os.environ.get('CS_MAX_TENANT_WORKERS', 4))
+
+#RETRY AND RATE LIMIT SETTINGS
+REQUEST_TIMEOUT = float(os.environ.get('CS_REQUEST_TIMEOUT', 30))
+MAX_RETRIES = int(os.environ.get('CS_MAX_RETRIES', 5))
+BACKOFF_BASE = float(os.environ.get('CS_BACKOFF_BASE', 0.5))
+BACKOFF_CAP = float(os.environ.get('CS_BACKOFF_CAP', 30))
+MAX_REQUESTS_PER_SECOND = float(os.environ.get('CS_MAX_REQUESTS_PER_SECOND', 10))
+RATE_LIMIT_RESERVE = int(os.environ.get('CS_RATE_LIMIT_RESERVE', 5))
+TOKEN_REFRESH_MARGIN = 60
+
+#ONE POOLED SESSION SHARED BY EVERY REQUEST (SIZED FOR THE WORKER THREADS OF EVERY TENANT FETCHED AT ONCE)
+_pool_size = MAX_WORKERS * max(1, min(MAX_TENANT_WORKERS, len(MEMBER_CIDS)))
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size))
+session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size))
+
+#RAISED WHEN THE API KEEPS FAILING OR ANSWERS WITH ERRORS INSTEAD OF RESOURCES
+class CrowdStrikeAPIError(Exception):
+    def __init__(self, message, status_code=None, errors=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.errors = errors or []
+
+_token_lock = threading.Lock()
+#MEMBER CID (None FOR THE API CLIENT'S OWN CID) -> (TOKEN, EXPIRY TIME), AND THE LOCK EACH ONE IS FETCHED UNDER
+_tokens = {}
+_tenant_token_locks = {}
+
+_rate_lock = threading.Lock()
+_next_request_at = 0
+_rate_remaining = None
+_rate_reset_at = 0
+
+#ONE TOKEN LOCK PER TENANT, SO A SLOW TOKEN CALL (RATE LIMIT WAITS, RETRIES) ONLY HOLDS UP ITS OWN TENANT
+def _tenant_token_lock(member_cid):
+    with _token_lock:
+        return _tenant_token_locks.setdefault(member_cid, threading.Lock())
+
+#GET ACCESS TOKEN FOR THE CLIENT'S OWN CID OR ONE MSSP CHILD CID (CACHED UNTIL SHORTLY BEFORE IT EXPIRES)
+def get_access_token(force_refresh=False, member_cid=None):
+    with _tenant_token_lock(member_cid):
+        token, expires_at = _tokens.get(member_cid, (None, 0))
+        if not force_refresh and token and time.time() < expires_at - TOKEN_REFRESH_MARGIN:
+            return token
+        data = {}
+        if member_cid:
+            data['member_cid'] = member_cid
+        with timed('api_token'):
+            response_result = _request('POST', '/oauth2/token', authenticate=False, data=data)
+        if 'access_token' not in response_result:
+            raise CrowdStrikeAPIError('token response has no access_token', errors=response_result.get('errors'))
+        token = response_result['access_token']
+        _tokens[member_cid] = (token, time.time() + float(response_result.get('expires_in', 1799)))
+        return token
+
+#DROP A REJECTED TOKEN (UNLESS ANOTHER THREAD ALREADY REPLACED IT)
+def _invalidate_token(token, member_cid=None):
+    with _tenant_token_lock(member_cid):
+        if _tokens.get(member_cid, (None, 0))[0] == token:
+            _tokens[member_cid] = (token, 0)
+
+#WAIT UNTIL THE NEXT REQUEST FITS BOTH THE LOCAL PACE AND THE API'S REMAINING BUDGET
+def _wait_for_rate_budget():
+    global _next_request_at
+    with _rate_lock:
+        now = time.time()
+        start_at = max(now, _next_request_at)
+        if _rate_remaining is not None and _rate_remaining <= RATE_LIMIT_RESERVE and _rate_reset_at > now:
+            start_at = max(start_at, _rate_reset_at)
+        _next_request_at = start_at + (1 / MAX_REQUESTS_PER_SECOND if MAX_REQUESTS_PER_SECOND > 0 else 0)
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+#REMEMBER THE RATE LIMIT HEADERS OF THE LAST RESPONSE
+def _record_rate_limit(response):
+    global _rate_remaining, _rate_reset_at
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    retry_after = _retry_after(response)
+    with _rate_lock:
+        if remaining is not None and remaining.isdigit():
+            _rate_remaining = int(remaining)
+            if _rate_remaining <= RATE_LIMIT_RESERVE and _rate_reset_at <= time.time():
+                # the limit is per minute; without a reset time, give it a moment to refill
+                _rate_reset_at = time.time() + (retry_after or 1)
+        if retry_after:
+            _rate_reset_at = max(_rate_reset_at, time.time() + retry_after)
+
+#SECONDS THE API ASKED US TO WAIT (X-RateLimit-RetryAfter IS AN EPOCH TIME, Retry-After IS SECONDS)
+def _retry_after(response):
+    retry_at = response.headers.get('X-RateLimit-RetryAfter')
+    if retry_at and retry_at.isdigit():
+        return max(0, int(retry_at) - time.time())
+    retry_after = response.headers.get('Retry-After')
+    if retry_after and retry_after.isdigit():
+        return int(retry_after)
+    return None
+
+#FULL-JITTER EXPONENTIAL BACKOFF
+def _backoff(attempt):
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+#SEND ONE API REQUEST, RETRYING 429s, 5xx AND CONNECTION ERRORS.
+#EVERY TENANT GOES THROUGH THE SAME _wait_for_rate_budget, SO PARALLEL TENANTS SHARE ONE RATE BUDGET
+def _request(method, path, authenticate=True, member_cid=None, **kwargs):
+    headers = dict(kwargs.pop('headers', {}))
+    last_error = None
+    for attempt in range(MAX_RETRIES + 1):
+        if authenticate:
+            token = get_access_token(member_cid=member_cid)
+            headers['Authorization'] = 'bearer ' + token
+        _wait_for_rate_budget()
+        try:
+            response = session.request(method, f'{API_BASE}{path}', headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            last_error = CrowdStrikeAPIError(f'{method} {path} failed: {e}')
+            time.sleep(_backoff(attempt))
+            continue
+        _record_rate_limit(response)
+
+        if response.status_code == 401 and authenticate and attempt == 0:
+            # the cached token was revoked or expired early
+            _invalidate_token(token, member_cid)
+            last_error = CrowdStrikeAPIError(f'{method} {path} returned 401', response.status_code)
+            continue
+        if response.status_code == 429 or response.status_code >= 500:
+            last_error = CrowdStrikeAPIError(f'{method} {path} returned {response.status_code}', response.status_code)
+            time.sleep(_retry_after(response) or _backoff(attempt))
+            continue
+
+        try:
+            response_result = response.json()
+        except ValueError:
+            raise CrowdStrikeAPIError(f'{method} {path} returned non-JSON ({response.status_code})', response.status_code)
+        if response.status_code >= 400:
+            raise CrowdStrikeAPIError(f'{method} {path} returned {response.status_code}', response.status_code,
+                                      response_result.get('errors'))
+        return response_result
+    raise last_error
+
+#GET LIST OF DETECTIONS (FOLLOWS PAGINATION UNTIL EVERY ID IS COLLECTED)
+def get_detections_list(fql_filter=None, member_cid=None):
+    if fql_filter is None:
+        fql_filter = f"created_timestamp:>'{new_york_year}-03-01T04:00:00.0Z'"
+    headers = {'Content-Type': 'application/json'}
+    params = {'filter': fql_filter, 'limit': QUERY_LIMIT}
+    detection_id_list = []
+    while True:
+        with timed('api_query'):
+            response_result = _request('GET', '/alerts/queries/alerts/v2', member_cid=member_cid, headers=headers, params=params)
+        resources = response_result.get("resources") or []
+        if not resources:
+            break
+        detection_id_list.extend(resources)
+        pagination = response_result.get('meta', {}).get('pagination', {})
+        if pagination.get('after'):
+            params['after'] = pagination['after']
+        elif len(detection_id_list) < pagination.get('total', 0):
+            params['offset'] = len(detection_id_list)
+        else:
+            break
+    count_rows('api_query', len(detection_id_list))
     return detection_id_list
 
-#GET DATA ON EACH DETECTION IN DETECTION LIST
-def get_detection_data(id_list, token):
-    headers = {'Content-Type': 'application/json', 'Accept': 'application/json','Authorization': 'bearer ' + token}
+#SPLIT A LIST INTO BATCHES OF AT MOST SIZE ITEMS
+def batched(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+#GET DATA FOR ONE BATCH OF DETECTION IDS
+def get_detection_batch(id_list, member_cid=None):
+    headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
     data = {'composite_ids': id_list}
-    response = requests.post('https://api.crowdstrike.com/alerts/entities/alerts/v2', headers=headers, json=data)
-    response_result = response.json()
-    detection_data = response_result["resources"]
+    with timed('api_entities'):
+        response_result = _request('POST', '/alerts/entities/alerts/v2', member_cid=member_cid, headers=headers, json=data)
+    detection_data = response_result.get("resources") or []
+    count_rows('api_entities', len(detection_data))
+    return detection_data
+
+#GET DATA ON EACH DETECTION IN DETECTION LIST (BATCHES RUN CONCURRENTLY)
+def get_detection_data(id_list, max_workers=MAX_WORKERS, member_cid=None):
+    batches = batched(id_list, ENTITY_BATCH_SIZE)
+    if not batches:
+        return []
+    detection_data = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+        for batch_data in executor.map(lambda batch: get_detection_batch(batch, member_cid), batches):
+            detection_data.extend(batch_data)
     return detection_data
 
 if __name__ == '__main__':
@@ -0,0 +1,150 @@
+import os
+import sys
+import glob
+import importlib.metadata
+import time
+import pickle
+import sqlite3
+import hashlib
+import logging
+import threading
+import functools
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+#CACHE SETTINGS (CS_CACHE_PATH='' KEEPS THE CACHE IN THIS PROCESS ONLY)
+CACHE_SIZE = int(os.environ.get('CS_CACHE_SIZE', 64))
+CACHE_DISK_SIZE = int(os.environ.get('CS_CACHE_DISK_SIZE', 256))
+CACHE_TTL = float(os.environ.get('CS_CACHE_TTL', 0))
+CACHE_PATH = os.environ.get('CS_CACHE_PATH', 'callback_cache.db')
+
+#IDENTIFIES THE CODE THAT BUILT AN ENTRY (HASH OF THE APP MODULES AND THE LIBRARIES THAT PICKLE RESULTS),
+#SO THE ON-DISK CACHE NEVER SERVES FIGURES OR PAGES BUILT BY AN EARLIER DEPLOY; CS_CACHE_VERSION OVERRIDES IT
+def code_version():
+    digest = hashlib.sha1(sys.version.encode())
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    for package in ('pandas', 'plotly', 'dash'):
+        try:
+            digest.update(f'{package}={importlib.metadata.version(package)}'.encode())
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return digest.hexdigest()[:12]
+
+CACHE_VERSION = os.environ.get('CS_CACHE_VERSION') or code_version()
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+#OPEN THE SHARED ON-DISK CACHE THAT EVERY WORKER PROCESS READS AND WRITES
+def _connect():
+    conn = sqlite3.connect(CACHE_PATH, timeout=5)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, stored_at REAL, accessed_at REAL, value BLOB)')
+    return conn
+
+#TRUE WHEN AN ENTRY STORED AT stored_at IS OLDER THAN THE TTL
+def _expired(stored_at, now):
+    return CACHE_TTL > 0 and now - stored_at > CACHE_TTL
+
+def _disk_get(key, now):
+    if not CACHE_PATH:
+        return None
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute('SELECT stored_at, value FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None or _expired(row[0], now):
+                return None
+            with conn:
+                conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+            return row[0], pickle.loads(row[1])
+        finally:
+            conn.close()
+    except Exception:
+        log.exception('callback cache read failed')
+        return None
+
+def _disk_put(key, stored_at, value):
+    if not CACHE_PATH:
+        return
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO cache (key, stored_at, accessed_at, value) VALUES (?, ?, ?, ?)',
+                             (key, stored_at, stored_at, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+                conn.execute('DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY accessed_at DESC LIMIT ?)',
+                             (CACHE_DISK_SIZE,))
+        finally:
+            conn.close()
+    except Exception:
+        log.exception('callback cache write failed')
+
+#LOOK A KEY UP IN MEMORY, THEN ON DISK; RETURNS (FOUND, VALUE)
+def get(key):
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and not _expired(entry[0], now):
+            _entries.move_to_end(key)
+            counters['hits'] += 1
+            return True, entry[1]
+    entry = _disk_get(key, now)
+    with _lock:
+        if entry is None:
+            counters['misses'] += 1
+            return False, None
+        counters['disk_hits'] += 1
+        _remember(key, entry)
+    return True, entry[1]
+
+#KEEP AN ENTRY IN THE IN-PROCESS LRU, EVICTING THE LEAST RECENTLY USED ONE WHEN FULL
+def _remember(key, entry):
+    _entries[key] = entry
+    _entries.move_to_end(key)
+    while len(_entries) > CACHE_SIZE:
+        _entries.popitem(last=False)
+        counters['evictions'] += 1
+
+def put(key, value):
+    stored_at = time.time()
+    with _lock:
+        _remember(key, (stored_at, value))
+    _disk_put(key, stored_at, value)
+
+#DROP THE IN-PROCESS ENTRIES (OLD DATASET VERSIONS ON DISK SIMPLY AGE OUT OF THE LRU)
+def invalidate():
+    with _lock:
+        _entries.clear()
+        counters['invalidations'] += 1
+
+#HIT/MISS COUNTERS AND SIZES FOR SIZING THE CACHE
+def stats():
+    with _lock:
+        result = dict(counters, size=len(_entries), max_size=CACHE_SIZE, ttl=CACHE_TTL, disk_path=CACHE_PATH or None,
+                      code_version=CACHE_VERSION)
+    lookups = result['hits'] + result['disk_hits'] + result['misses']
+    result['hit_ratio'] = (result['hits'] + result['disk_hits']) / lookups if lookups else None
+    return result
+
+#CACHE A FUNCTION'S RESULT PER (CODE VERSION, ARGUMENTS, DATASET VERSION); version IS CALLED ON EVERY LOOKUP
+def memoize(version):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = hashlib.sha1(repr((CACHE_VERSION, func.__module__, func.__qualname__, args, version())).encode()).hexdigest()
+            found, value = get(key)
+            if found:
+                return value
+            value = func(*args)
+            put(key, value)
+            return value
+        return wrapper
+    return decorator
+
+if __name__ == '__main__':
+    None
@@ -1,5 +1,25 @@
 from datetime import datetime
 import pytz
+import pandas as pd
+from cs_telemetry import timed, count_rows
+
+#COLUMNS THE DASHBOARD KEEPS AFTER FLATTENING AND THE DTYPE EACH IS STORED AS.
+#EVERYTHING ELSE STAYS IN THE RAW PAYLOAD IN THE LOCAL STORE (cs_store.get_alerts)
+frame_schema = {'composite_id': 'object',
+                'created_timestamp': 'datetime64[ns]',
+                'updated_timestamp': 'object',
+                'hostname': 'category',
+                'os_version': 'category',
+                'user_name': 'category',
+                'severity_name': 'category',
+                'status': 'category',
+                'assigned_to_name': 'category',
+                'tags0': 'category',
+                'comment': 'object',
+                'cid': 'category',
+                'tenant': 'category',
+                'seconds_to_triaged': 'float32',
+                'seconds_to_resolved': 'float32'}
 
 def to_local_time(UTC):
     # Input UTC datetime string
@@ -19,48 +39,127 @@ def to_local_time(UTC):
     return est_datetime.strftime('%Y-%m-%d %H:%M:%S')
 
 
-#USED IN THE FLATTEN_DICT FUNCTION
-def flatten_value(value):
-    if isinstance(value, dict):
-        return ', '.join([f"{k}: {v}" for k, v in value.items()])
-    elif isinstance(value, list):
-        return ', '.join(map(str, value))
-    return value
-
-#REMOVE DICTIONARIES AND LIST VALUES FROM DICTIONARY
+#REMOVE DICTIONARIES AND LIST VALUES FROM DICTIONARY (created_timestamp CONVERTED TO LOCAL TIME)
 def flatten_dict(d):
     flattened = {}
+    if _flatten_into(flattened, d):
+        flattened['created_timestamp'] = to_local_time(flattened['created_timestamp'])
+    return flattened
+
+#FLATTEN ONE ALERT INTO flattened WITHOUT CONVERTING TIMESTAMPS; ONLY keys ARE MATERIALIZED WHEN GIVEN (indexed FROM
+#_indexed_keys). EVERY KEY IS STILL VISITED, SINCE A LATER NESTED KEY CAN OVERWRITE A WANTED ONE, BUT OTHER VALUES
+#ARE NEVER JOINED, CONCATENATED OR COPIED. RETURNS TRUE WHEN THE FINAL created_timestamp CAME FROM THE TOP LEVEL OF A
+#DICT, WHICH IS THE ONE THE DASHBOARD HAS ALWAYS CONVERTED TO LOCAL TIME
+def _flatten_into(flattened, d, keys=None, indexed=None):
+    converted = False
     for k, v in d.items():
-        if k == 'show_in_ui' and v == False:
-            None
+        value_type = type(v)
+        if value_type is dict:
+            for k2, v2 in v.items():
+                value_type = type(v2)
+                if value_type is dict:
+                    nested = {}
+                    nested_converted = _flatten_into(nested, v2, keys, indexed)
+                    flattened.update(nested)
+                    if 'created_timestamp' in nested:
+                        converted = nested_converted
+                    continue
+                elif keys is None or k2 in keys:
+                    flattened[k2] = ', '.join(map(str, v2)) if value_type is list else v2
+                if k2 == 'created_timestamp':
+                    converted = False
+        elif value_type is list:
+            wanted = None if keys is None else indexed.get(k, ())
+            for i, item in enumerate(v):
+                if type(item) is dict:
+                    for k2, v2 in item.items():
+                        value_type = type(v2)
+                        if value_type is dict:
+                            nested = {}
+                            nested_converted = _flatten_into(nested, v2, keys, indexed)
+                            flattened.update(nested)
+                            if 'created_timestamp' in nested:
+                                converted = nested_converted
+                        elif keys is None or i in indexed.get(k2, ()):
+                            flattened[k2 + str(i)] = ', '.join(map(str, v2)) if value_type is list else v2
+                elif wanted is None or i in wanted:
+                    flattened[k + str(i)] = item
+        elif k == 'show_in_ui' and v == False:
+            continue
+        elif keys is None or k in keys:
+            flattened[k] = v
+        if k == 'created_timestamp':
+            converted = True
+    return converted
+
+#FOR EVERY WAY A KEY CAN BE SPLIT INTO NAME + LIST INDEX ("tags0" -> tags, 0), THE INDEXES WANTED PER NAME
+def _indexed_keys(keys):
+    indexed = {}
+    for key in keys:
+        for split in range(len(key) - 1, 0, -1):
+            if not key[split:].isdigit():
+                break
+            if key[split] != '0' or split == len(key) - 1:
+                indexed.setdefault(key[:split], set()).add(int(key[split:]))
+    return indexed
+
+#CONVERT A COLUMN OF UTC API TIMESTAMPS TO US/EASTERN IN ONE PASS (FRACTIONAL SECONDS DROPPED, AS IN TO_LOCAL_TIME)
+def to_local_time_series(utc):
+    utc_datetime = pd.to_datetime(utc, utc=True, format='ISO8601')
+    return utc_datetime.dt.floor('s').dt.tz_convert('US/Eastern').dt.tz_localize(None)
+
+#FLATTEN A WHOLE LIST OF ALERTS INTO THE DASHBOARD FRAME (SAME COLUMNS AS FLATTEN_DICT ROW BY ROW,
+#OR ONLY THE GIVEN COLUMNS, IN WHICH CASE NO OTHER FIELD IS EVER FLATTENED)
+def flatten_alerts(alerts, columns=None):
+    rows = []
+    converted = []
+    keys = set(columns) if columns is not None else None
+    indexed = _indexed_keys(keys) if keys is not None else None
+    with timed('flatten'):
+        for alert in alerts:
+            if alert.get('show_in_ui') == False:
+                continue
+            flattened = {}
+            converted.append(_flatten_into(flattened, alert, keys, indexed))
+            rows.append(flattened)
+    count_rows('flatten', len(rows))
+    with timed('dataframe'):
+        data = pd.DataFrame(rows, columns=columns)
+    if data.empty:
+        return pd.DataFrame(columns=columns or ['created_timestamp'])
+    if 'created_timestamp' in data.columns:
+        with timed('timestamps'):
+            converted = pd.Series(converted, index=data.index)
+            raw = data['created_timestamp']
+            local = to_local_time_series(raw.where(converted))
+            if not converted.all():
+                # timestamps flatten_dict would have left in UTC stay in UTC
+                utc = pd.to_datetime(raw.where(~converted), utc=True, format='ISO8601').dt.tz_localize(None)
+                local = local.where(converted, utc)
+            data['created_timestamp'] = local
+    return data
+
+#KEEP ONLY THE SCHEMA COLUMNS, STORED AS THEIR COMPACT DTYPES
+def compact_frame(data):
+    data = data.reindex(columns=list(frame_schema))
+    # alerts not synced for an MSSP child CID (and older snapshots) are their own cid's tenant
+    tenant = data['tenant'].astype(object)
+    data['tenant'] = tenant.where(tenant.notna(), data['cid'].astype(object))
+    for column, dtype in frame_schema.items():
+        if dtype.startswith('float'):
+            data[column] = pd.to_numeric(data[column], errors='coerce').astype(dtype)
+        elif dtype.startswith('datetime'):
+            data[column] = pd.to_datetime(data[column]).astype(dtype)
         else:
-            if isinstance(v, dict):
-                for k2, v2 in v.items():
-                    if isinstance(v2, dict):
-                        flattened.update(flatten_dict(v2))
-                    elif isinstance(v2, list):
-                        flattened[k2] = flatten_value(v2)
-                    else:
-                        flattened[k2] = flatten_value(v2)
-            # flattened[k] = flatten_value(v)
-            elif isinstance(v, list):
-                for i in range(0, len(v)):
-                    if isinstance(v[i], dict):
-                        for k2, v2 in v[i].items():
-                            if isinstance(v2, dict):
-                                flattened.update(flatten_dict(v2))
-                            elif isinstance(v2, list):
-                                flattened[k2 + f'{i}'] = flatten_value(v2)
-                            else:
-                                flattened[k2 + f'{i}'] = flatten_value(v2)
-                    else:
-                        flattened[k + f'{i}'] = v[i]
-                #flattened[k] = flatten_value(v)
-            else:
-                flattened[k] = v
-            if k == 'created_timestamp':
-                flattened[k] = to_local_time(v)
-    return flattened
+            data[column] = data[column].astype(dtype)
+    return data
+
+#THE DASHBOARD FRAME FOR A LIST OF ALERTS
+def build_frame(alerts):
+    # tenant is not an alert field; compact_frame fills it in
+    data = flatten_alerts(alerts, columns=[column for column in frame_schema if column != 'tenant'])
+    with timed('compact'):
+        return compact_frame(data)
 
 if __name__ == '__main__':
     None
\ No newline at end of file
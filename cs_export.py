@@ -0,0 +1,103 @@
+import io
+import zlib
+import logging
+import importlib.util
+
+log = logging.getLogger(__name__)
+
+#ROWS SERIALIZED PER CHUNK WHILE STREAMING AN EXPORT
+EXPORT_CHUNK_ROWS = 10000
+
+#FILE EXTENSION AND CONTENT TYPE OF EACH EXPORT FORMAT
+export_formats = {'csv': ('csv', 'text/csv'),
+                  'csv.gz': ('csv.gz', 'application/gzip'),
+                  'parquet': ('parquet', 'application/vnd.apache.parquet')}
+
+#CSV TEXT OF THE FRAME, ONE CHUNK OF ROWS AT A TIME
+def csv_chunks(data, chunk_rows=EXPORT_CHUNK_ROWS):
+    if data.empty:
+        yield data.to_csv(index=False).encode()
+        return
+    for start in range(0, len(data), chunk_rows):
+        yield data.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode()
+
+#GZIP THE CSV CHUNKS AS THEY ARE PRODUCED (A SINGLE GZIP MEMBER)
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+#WRITE-ONLY FILE THAT HANDS BACK WHATEVER WAS WRITTEN SINCE THE LAST DRAIN
+class _DrainableSink(io.RawIOBase):
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.buffer += b
+        self.position += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        return chunk
+
+#PARQUET FILE OF THE FRAME, ONE ROW GROUP PER CHUNK OF ROWS (NEEDS pyarrow)
+def parquet_chunks(data, chunk_rows=EXPORT_CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    sink = _DrainableSink()
+    schema = pa.Schema.from_pandas(data, preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, max(len(data), 1), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(data.iloc[start:start + chunk_rows], schema=schema, preserve_index=False))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+#PARQUET EXPORT IS ONLY OFFERED WHEN pyarrow IS INSTALLED
+def parquet_available():
+    # find_spec only looks the package up, so the layout does not pay for importing pyarrow
+    return importlib.util.find_spec('pyarrow') is not None
+
+#EVERY FLATTENED FIELD OF THE SELECTED ALERTS, AS THE DASHBOARD USED TO EXPORT THEM. THE SERVED FRAME ONLY KEEPS
+#THE SCHEMA COLUMNS, SO THE ROWS ARE REBUILT FROM THE RAW PAYLOADS IN THE LOCAL STORE, IN THE ORDER OF data
+def export_frame(data):
+    import pandas as pd
+    from cs_store import get_alerts
+    from cs_clean_data import flatten_alerts
+    if 'composite_id' not in data.columns:
+        return data
+    composite_ids = data['composite_id'].dropna().tolist()
+    stored = {alert['composite_id']: alert for alert in get_alerts(composite_ids)}
+    export = flatten_alerts([stored[composite_id] for composite_id in composite_ids if composite_id in stored])
+    # alerts the store does not hold (e.g. a snapshot served without its store) keep the columns the frame has
+    missing = data[~data['composite_id'].isin(list(stored))]
+    if missing.empty:
+        return export
+    log.warning('%d exported alerts are not in the local store, exporting their dashboard columns only', len(missing))
+    return pd.concat([export, missing.drop(columns=['tenant'], errors='ignore')], ignore_index=True)
+
+#STREAM THE FRAME IN THE REQUESTED FORMAT
+def export_chunks(data, export_format):
+    if export_format == 'csv':
+        return csv_chunks(data)
+    elif export_format == 'csv.gz':
+        return gzip_chunks(csv_chunks(data))
+    elif export_format == 'parquet':
+        return parquet_chunks(data)
+    raise ValueError(f'unknown export format {export_format!r}')
+
+if __name__ == '__main__':
+    None
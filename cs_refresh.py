@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+import logging
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from cs_analytics import Rollup, build_rollup
+from cs_table import filter_date_range
+import cs_cache
+from cs_telemetry import timed, count_rows
+
+log = logging.getLogger(__name__)
+
+#SECONDS BETWEEN BACKGROUND REFRESHES
+REFRESH_INTERVAL = int(os.environ.get('CS_REFRESH_INTERVAL', 300))
+
+#BUILT TENANT FRAMES SAVED AFTER EVERY REFRESH SO A RESTART CAN SERVE IT IMMEDIATELY
+SNAPSHOT_PATH = os.environ.get('CS_SNAPSHOT_PATH', 'alerts_snapshot.pkl')
+
+#PROCESSES THAT BUILD CHANGED TENANT FRAMES AT ONCE (1 BUILDS THEM IN THE REFRESH THREAD)
+FRAME_WORKERS = int(os.environ.get('CS_FRAME_WORKERS', 1))
+
+#ONE TENANT'S ALERTS AS ITS OWN FRAME, WITH ITS OWN ROLLUP AND THE ROW HASH THE DATASET FINGERPRINT IS SUMMED FROM
+Partition = namedtuple('Partition', ['data', 'rollup', 'hash'])
+
+#IMMUTABLE VIEW OF THE DATA THE DASHBOARD IS SERVING.
+#partitions MAPS EVERY TENANT TO ITS PARTITION (NEVER CONCATENATED, SO A SELECTION ONLY TOUCHES THE TENANTS IT NAMES);
+#generations HOLDS THE STORE GENERATION OF EVERY TENANT THE PARTITIONS WERE BUILT FROM (EMPTY WHEN UNKNOWN)
+Snapshot = namedtuple('Snapshot', ['partitions', 'refreshed_at', 'version', 'fingerprint', 'generations'])
+
+_empty_frame = pd.DataFrame(columns=['created_timestamp'])
+_empty_rollup = build_rollup(_empty_frame)
+_snapshot = Snapshot({}, None, 0, '0:0', {})
+_refresh_lock = threading.Lock()
+_thread = None
+last_error = None
+
+#BUILD THE DASHBOARD FRAME FROM THE STORED ALERTS
+def build_frame(alerts):
+    from cs_clean_data import build_frame
+    return build_frame(alerts)
+
+#HASH OF A FRAME'S ROWS BY CONTENT, SO EVERY WORKER SERVING THE SAME ALERTS SHARES CACHE ENTRIES
+def row_hash(data):
+    columns = [column for column in ('composite_id', 'updated_timestamp') if column in data.columns]
+    if not columns:
+        return 0
+    return int(pd.util.hash_pandas_object(data[columns], index=False).sum())
+
+#IDENTIFY THE DATASET BY ITS ROW COUNT AND THE ROW HASHES OF EVERY PARTITION
+def fingerprint(partitions):
+    rows = sum(len(part.data) for part in partitions.values())
+    return f"{rows}:{sum(part.hash for part in partitions.values()) % 2 ** 64}"
+
+#A TENANT'S FRAME WITH ITS ROLLUP BUILT
+def index_partition(data):
+    return Partition(data, build_rollup(data), row_hash(data))
+
+#SPLIT A FRAME HOLDING SEVERAL TENANTS INTO ONE FRAME PER TENANT (ALERTS WITHOUT ANY CID UNDER None)
+def split_tenants(data):
+    if 'tenant' not in data.columns or data.empty:
+        return {}
+    groups = data.groupby('tenant', observed=True, sort=True, dropna=False).indices
+    return {None if pd.isna(tenant) else tenant: data.take(positions).reset_index(drop=True)
+            for tenant, positions in groups.items()}
+
+#GET THE SNAPSHOT CURRENTLY BEING SERVED
+def get_snapshot():
+    return _snapshot
+
+#ALERTS IN THE SNAPSHOT, OVER EVERY TENANT
+def row_count(snapshot):
+    return sum(len(part.data) for part in snapshot.partitions.values())
+
+#OLDEST AND NEWEST created_timestamp OVER EVERY TENANT (None, None WHEN THERE ARE NO ALERTS)
+def date_range(snapshot):
+    frames = [part.data['created_timestamp'] for part in snapshot.partitions.values() if not part.data.empty]
+    if not frames:
+        return None, None
+    return min(frame.min() for frame in frames), max(frame.max() for frame in frames)
+
+#PARTITIONS OF THE SELECTED TENANTS (EVERY TENANT WHEN NONE ARE SELECTED)
+def _selected(snapshot, cids):
+    if not cids:
+        return list(snapshot.partitions.values())
+    return [snapshot.partitions[cid] for cid in cids if cid in snapshot.partitions]
+
+#THE ROWS OF THE SELECTED TENANTS ONLY, INSIDE THE DATE RANGE WHEN ONE IS GIVEN, OLDEST FIRST.
+#ONLY THE SELECTED PARTITIONS ARE READ, AND THEY ARE DATE-FILTERED BEFORE BEING PUT TOGETHER
+def select_tenants(snapshot, cids, start_date=None, end_date=None):
+    frames = [part.data for part in _selected(snapshot, cids)]
+    if start_date is not None and end_date is not None:
+        frames = [filter_date_range(frame, start_date, end_date) for frame in frames]
+    if not frames:
+        return _empty_frame
+    if len(frames) == 1:
+        return frames[0]
+    data = pd.concat(frames, ignore_index=True)
+    return data.take(np.argsort(data['created_timestamp'].to_numpy(), kind='stable')).reset_index(drop=True)
+
+#THE DAY BUCKETS OF THE SELECTED TENANTS ONLY
+def select_rollup(snapshot, cids):
+    rollups = [part.rollup for part in _selected(snapshot, cids)]
+    if not rollups:
+        return _empty_rollup
+    if len(rollups) == 1:
+        return rollups[0]
+    return Rollup(*(pd.concat(frames, ignore_index=True) for frames in zip(*rollups)))
+
+#SWAP IN FULLY BUILT PARTITIONS (FRAMES ARE INDEXED, ALREADY BUILT PARTITIONS ARE KEPT AS THEY ARE) IN A SINGLE
+#REFERENCE ASSIGNMENT, SO READERS NEVER SEE A HALF-BUILT SNAPSHOT
+def publish(partitions, refreshed_at=None, generations=None):
+    global _snapshot
+    indexed = {}
+    with timed('rollup'):
+        for tenant, part in partitions.items():
+            if not isinstance(part, Partition):
+                if part.empty:
+                    continue
+                part = index_partition(part)
+            indexed[tenant] = part
+    partitions = indexed
+    count_rows('rollup', sum(len(part.rollup.counts) for part in partitions.values()))
+    _snapshot = Snapshot(partitions, refreshed_at or datetime.now(), _snapshot.version + 1, fingerprint(partitions),
+                         generations or {})
+    cs_cache.invalidate()
+    return _snapshot
+
+#WRITE EVERY TENANT'S FRAME TO DISK (RENAMED INTO PLACE SO OTHER WORKERS NEVER READ A PARTIAL FILE)
+def save_snapshot(partitions, path=None):
+    path = path or SNAPSHOT_PATH
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    pd.to_pickle({tenant: part.data for tenant, part in partitions.items()}, tmp_path)
+    os.replace(tmp_path, path)
+
+#SERVE THE LAST SAVED TENANT FRAMES (OR A SINGLE FRAME SAVED BY AN OLDER VERSION), OR NOTHING IF THERE ARE NONE YET
+def load_snapshot(path=None):
+    path = path or SNAPSHOT_PATH
+    try:
+        from cs_clean_data import compact_frame
+        saved = pd.read_pickle(path)
+        if isinstance(saved, pd.DataFrame):
+            # a single frame, saved before tenants were kept apart
+            frames = split_tenants(compact_frame(saved))
+        else:
+            frames = {tenant: compact_frame(data) for tenant, data in saved.items()}
+        refreshed_at = datetime.fromtimestamp(os.path.getmtime(path))
+    except FileNotFoundError:
+        return _snapshot
+    except Exception:
+        log.exception('could not read snapshot %s, starting empty', path)
+        return _snapshot
+    return publish(frames, refreshed_at)
+
+#THE FRAME OF ONE TENANT'S STORED ALERTS (EVERY STORED ALERT FOR THE CLIENT'S OWN CID)
+def build_partition(member_cid):
+    from cs_store import load_alerts
+    if member_cid is None:
+        return build_frame(load_alerts())
+    data = build_frame(load_alerts(tenants=[member_cid]))
+    # rows are keyed by the member CID as configured, whatever form the alerts' own cid takes
+    data['tenant'] = pd.Categorical([member_cid] * len(data))
+    return data
+
+#BUILD THE FRAMES OF SEVERAL TENANTS, IN WORKER PROCESSES WHEN CS_FRAME_WORKERS ALLOWS IT
+def build_partitions(member_cids):
+    if FRAME_WORKERS > 1 and len(member_cids) > 1:
+        # spawn, because forking a process that is serving requests from other threads is not safe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(FRAME_WORKERS, len(member_cids)), mp_context=context) as executor:
+            return dict(zip(member_cids, executor.map(build_partition, member_cids)))
+    return {member_cid: build_partition(member_cid) for member_cid in member_cids}
+
+#SYNC THE STORE, REBUILD THE PARTITIONS OF TENANTS THAT CHANGED OFF THE REQUEST PATH AND SWAP THEM IN.
+#A TENANT IS REBUILT WHEN THE STORE HOLDS A NEWER GENERATION THAN THE SERVED FRAME WAS BUILT FROM, SO ALERTS
+#ANOTHER WORKER (OR python cs_store.py) SYNCED ARE PICKED UP AS WELL AS THOSE THIS PROCESS SYNCED
+def refresh():
+    global last_error, _snapshot
+    from cs_store import sync_tenants, get_generations
+    with _refresh_lock, timed('refresh'):
+        synced = sync_tenants()
+        # keep serving what is already stored for a tenant whose API calls failed
+        errors = [e for e in synced.values() if isinstance(e, Exception)]
+        last_error = errors[0] if errors else None
+
+        current = _snapshot
+        # read before building, so a sync landing while the frames are built is picked up next time
+        generations = get_generations(list(synced))
+        stale = [member_cid for member_cid in synced
+                 if member_cid not in current.generations or current.generations[member_cid] != generations[member_cid]]
+        if not stale:
+            # nothing new: the served partitions, their rollups and every cached callback result stay valid
+            _snapshot = current._replace(refreshed_at=datetime.now())
+            return _snapshot
+        with timed('build_partitions'):
+            built = build_partitions(stale)
+
+        if None in synced:
+            # the client's own CID: every stored alert, split by the cid it belongs to
+            partitions = split_tenants(built[None])
+        else:
+            # tenants that did not change keep their frame and rollup as they are; nothing is concatenated
+            partitions = {member_cid: current.partitions[member_cid] for member_cid in synced
+                          if member_cid not in built and member_cid in current.partitions}
+            partitions.update(built)
+        snapshot = publish(partitions, generations=generations)
+        try:
+            save_snapshot(snapshot.partitions)
+        except Exception:
+            log.exception('could not save snapshot')
+        return snapshot
+
+#REFRESH RIGHT AWAY (UNLESS TOLD NOT TO), THEN ON A FIXED INTERVAL
+def _run(interval, refresh_now):
+    while True:
+        if refresh_now:
+            try:
+                refresh()
+            except Exception:
+                log.exception('background refresh failed')
+        refresh_now = True
+        time.sleep(interval)
+
+#START THE BACKGROUND REFRESH THREAD (ONCE PER PROCESS)
+def start(interval=REFRESH_INTERVAL, refresh_now=True):
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_run, args=(interval, refresh_now), name='alert-refresh', daemon=True)
+        _thread.start()
+    return _thread
+
+#HUMAN READABLE LAST REFRESH AND STALENESS
+def describe_staleness(snapshot=None):
+    snapshot = snapshot or _snapshot
+    if snapshot.refreshed_at is None:
+        return 'Waiting for first refresh'
+    age = int((datetime.now() - snapshot.refreshed_at).total_seconds())
+    text = f"Last refresh: {snapshot.refreshed_at.strftime('%Y-%m-%d %H:%M:%S')} ({age // 60} min {age % 60} s ago)"
+    if last_error is not None:
+        text += ' - last sync failed, showing stored data'
+    return text
+
+if __name__ == '__main__':
+    None
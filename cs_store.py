@@ -0,0 +1,161 @@
+import os
+import json
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from cs_telemetry import timed, count_rows
+
+log = logging.getLogger(__name__)
+
+#LOCAL ALERT STORE LOCATION
+STORE_PATH = os.environ.get('CS_STORE_PATH', 'alerts.db')
+
+#OPEN THE STORE AND CREATE THE TABLES ON FIRST USE
+def connect(path=None):
+    conn = sqlite3.connect(path or STORE_PATH, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('''CREATE TABLE IF NOT EXISTS alerts (
+                        composite_id TEXT PRIMARY KEY,
+                        cid TEXT,
+                        created_timestamp TEXT,
+                        updated_timestamp TEXT,
+                        raw TEXT NOT NULL,
+                        tenant TEXT)''')
+    _add_tenant_column(conn)
+    # every tenant is read as its own partition
+    conn.execute('CREATE INDEX IF NOT EXISTS alerts_by_tenant ON alerts (tenant, created_timestamp)')
+    conn.execute('CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)')
+    return conn
+
+#STORES CREATED BEFORE MULTI-TENANT SYNC KEEP EVERY ALERT UNDER ITS OWN CID AS THE TENANT
+def _add_tenant_column(conn):
+    if 'tenant' in [row[1] for row in conn.execute('PRAGMA table_info(alerts)')]:
+        return
+    try:
+        with conn:
+            conn.execute('ALTER TABLE alerts ADD COLUMN tenant TEXT')
+            conn.execute('UPDATE alerts SET tenant = cid')
+    except sqlite3.OperationalError:
+        # another worker added it first
+        pass
+
+#SYNC STATE KEY OF A PER-TENANT VALUE (THE CLIENT'S OWN CID OR ONE MSSP CHILD CID)
+def _state_key(name, member_cid=None):
+    return f'{name}:{member_cid}' if member_cid else name
+
+#GET THE UPDATED_TIMESTAMP HIGH-WATER MARK OF THE LAST SYNC
+def get_high_water_mark(conn, member_cid=None):
+    row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (_state_key('updated_timestamp', member_cid),)).fetchone()
+    return row[0] if row else None
+
+#GENERATION OF EVERY TENANT'S STORED ALERTS. IT GROWS WITH EVERY UPSERT THAT CHANGED SOMETHING, WHICHEVER
+#PROCESS DID THE SYNC, SO A FRAME BUILT FROM AN OLDER GENERATION IS KNOWN TO BE STALE
+def get_generations(member_cids, path=None):
+    conn = connect(path)
+    try:
+        generations = {}
+        for member_cid in member_cids:
+            row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (_state_key('generation', member_cid),)).fetchone()
+            generations[member_cid] = int(row[0]) if row else 0
+        return generations
+    finally:
+        conn.close()
+
+#INSERT NEW ALERTS AND REPLACE CHANGED ONES, THEN MOVE THE HIGH-WATER MARK AND THE GENERATION FORWARD.
+#ALERTS ARE KEPT UNDER THE MEMBER CID THEY WERE SYNCED FOR (THEIR OWN CID FOR THE CLIENT'S OWN CID), SO A TENANT
+#IS LOADED BACK EXACTLY AS CONFIGURED. RETURNS HOW MANY ALERTS WERE NEW OR ACTUALLY CHANGED
+def upsert_alerts(conn, alerts, member_cid=None):
+    rows = [(a['composite_id'], a.get('cid'), a.get('created_timestamp'), a.get('updated_timestamp'), json.dumps(a),
+             member_cid or a.get('cid'))
+            for a in alerts if a.get('composite_id')]
+    with conn:
+        # identical re-fetches (the >= overlap of every sync) are skipped, so they do not count as changes
+        cursor = conn.executemany('''INSERT INTO alerts (composite_id, cid, created_timestamp, updated_timestamp, raw, tenant)
+                                     VALUES (?, ?, ?, ?, ?, ?)
+                                     ON CONFLICT(composite_id) DO UPDATE SET
+                                         cid = excluded.cid,
+                                         created_timestamp = excluded.created_timestamp,
+                                         updated_timestamp = excluded.updated_timestamp,
+                                         raw = excluded.raw,
+                                         tenant = excluded.tenant
+                                     WHERE excluded.raw IS NOT alerts.raw OR excluded.tenant IS NOT alerts.tenant''', rows)
+        changed = max(cursor.rowcount, 0)
+        newest = max((row[3] for row in rows if row[3]), default=None)
+        current = get_high_water_mark(conn, member_cid)
+        if newest and (current is None or newest > current):
+            conn.execute('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)',
+                         (_state_key('updated_timestamp', member_cid), newest))
+        if changed:
+            conn.execute('''INSERT INTO sync_state (key, value) VALUES (?, '1')
+                            ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1''',
+                         (_state_key('generation', member_cid),))
+    return changed
+
+#FETCH ONLY ALERTS CREATED OR CHANGED SINCE THE LAST SYNC AND UPSERT THEM (ONE TENANT WHEN member_cid IS GIVEN)
+def sync(path=None, member_cid=None):
+    from cs_api import get_detections_list, get_detection_data
+    conn = connect(path)
+    try:
+        high_water_mark = get_high_water_mark(conn, member_cid)
+        # >= so alerts sharing the last timestamp are not missed; the upsert makes the overlap harmless
+        fql_filter = f"updated_timestamp:>='{high_water_mark}'" if high_water_mark else None
+        alerts = get_detection_data(get_detections_list(fql_filter, member_cid=member_cid), member_cid=member_cid)
+        with timed('store_upsert'):
+            upserted = upsert_alerts(conn, alerts, member_cid)
+        count_rows('store_upsert', upserted)
+        return upserted
+    finally:
+        conn.close()
+
+#SYNC EVERY CONFIGURED TENANT IN PARALLEL (ALL SHARE cs_api'S RATE BUDGET).
+#RETURNS {TENANT: CHANGED ALERTS}, WITH THE EXCEPTION INSTEAD FOR A TENANT THAT FAILED
+def sync_tenants(member_cids=None, path=None):
+    from cs_api import MEMBER_CIDS, MAX_TENANT_WORKERS
+    member_cids = list(member_cids if member_cids is not None else MEMBER_CIDS) or [None]
+    def sync_tenant(member_cid):
+        try:
+            with timed('sync_tenant'):
+                return sync(path, member_cid)
+        except Exception as e:
+            log.exception('alert sync failed for %s', member_cid or 'own cid')
+            return e
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_TENANT_WORKERS, len(member_cids)))) as executor:
+        return dict(zip(member_cids, executor.map(sync_tenant, member_cids)))
+
+#LOAD STORED ALERTS AS THE ORIGINAL API DICTS (EVERY TENANT, OR ONLY THE PARTITIONS OF THE GIVEN TENANTS)
+def load_alerts(path=None, tenants=None):
+    conn = connect(path)
+    try:
+        with timed('store_load'):
+            if tenants is None:
+                rows = conn.execute('SELECT raw FROM alerts ORDER BY created_timestamp')
+            else:
+                tenants = list(tenants)
+                placeholders = ', '.join('?' for _ in tenants)
+                rows = conn.execute(f'SELECT raw FROM alerts WHERE tenant IN ({placeholders}) ORDER BY created_timestamp',
+                                    tenants)
+            return [json.loads(raw) for (raw,) in rows]
+    finally:
+        conn.close()
+
+#LOAD THE FULL API DICT OF SPECIFIC ALERTS (FIELDS THE DASHBOARD FRAME DOES NOT KEEP)
+def get_alerts(composite_ids, path=None):
+    composite_ids = list(composite_ids)
+    if not composite_ids:
+        return []
+    conn = connect(path)
+    try:
+        alerts = []
+        # in chunks, so an export of every alert stays under SQLite's limit on bound parameters
+        for start in range(0, len(composite_ids), 500):
+            chunk = composite_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            rows = conn.execute(f'SELECT raw FROM alerts WHERE composite_id IN ({placeholders})', chunk)
+            alerts.extend(json.loads(raw) for (raw,) in rows)
+        return alerts
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    for member_cid, synced in sync_tenants().items():
+        print(f'{member_cid or "own cid"}: {synced} alerts synced')
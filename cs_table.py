@@ -0,0 +1,120 @@
+import math
+import pandas as pd
+
+#OPERATORS EMITTED BY THE DATATABLE FILTER ROW
+operators = [['ge ', '>='],
+             ['le ', '<='],
+             ['lt ', '<'],
+             ['gt ', '>'],
+             ['ne ', '!='],
+             ['eq ', '='],
+             ['contains '],
+             ['datestartswith ']]
+
+#TURN THE PICKER DATES INTO [FIRST DAY, DAY AFTER THE LAST DAY) SO BOTH END DAYS ARE INCLUDED IN FULL
+#(ValueError FOR A VALUE THAT IS NOT A DATE, INCLUDING ONE THAT PARSES TO NaT)
+def date_bounds(start_date, end_date):
+    start_day, end_day = pd.to_datetime(start_date), pd.to_datetime(end_date)
+    if pd.isna(start_day) or pd.isna(end_day):
+        raise ValueError('start_date and end_date must be dates')
+    return start_day.normalize(), end_day.normalize() + pd.Timedelta(days=1)
+
+#KEEP ONLY ALERTS CREATED INSIDE THE SELECTED DATE RANGE
+def filter_date_range(data, start_date, end_date):
+    start_day, end_day = date_bounds(start_date, end_date)
+    return data[(data['created_timestamp'] >= start_day) & (data['created_timestamp'] < end_day)]
+
+#SPLIT ONE "{column} op value" FILTER EXPRESSION INTO ITS PARTS
+def split_filter_part(filter_part):
+    for operator_type in operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                elif operator_type[0] in ('contains ', 'datestartswith '):
+                    # text operators keep "01" as typed instead of turning it into 1.0
+                    value = value_part
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+#FILTER VALUE AS THE TEXT THE USER TYPED (5 RATHER THAN 5.0)
+def _filter_text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+#MASK OF ONE COMPARISON, WITH THE VALUE COERCED TO THE COLUMN'S TYPE (None WHEN IT CANNOT BE COMPARED)
+def compare_column(column, operator, value):
+    if pd.api.types.is_datetime64_any_dtype(column):
+        value = pd.to_datetime(_filter_text(value), errors='coerce')
+    elif pd.api.types.is_numeric_dtype(column):
+        value = pd.to_numeric(value, errors='coerce')
+    else:
+        # unordered categoricals only support eq/ne, and text cannot be ordered against numbers,
+        # so text columns compare as text; empty cells only match ne
+        mask = getattr(column.astype(object).astype(str), operator)(_filter_text(value)) & column.notna()
+        return mask | column.isna() if operator == 'ne' else mask
+    if pd.isna(value):
+        return None
+    # these operators match pandas series operator method names
+    return getattr(column, operator)(value)
+
+#APPLY THE TABLE FILTER QUERY (PARTS THAT CANNOT BE APPLIED TO THEIR COLUMN ARE IGNORED)
+def apply_filter_query(data, filter_query):
+    for filter_part in (filter_query or '').split(' && '):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in data.columns:
+            continue
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            mask = compare_column(data[col_name], operator, filter_value)
+            if mask is not None:
+                data = data.loc[mask]
+        elif operator == 'contains':
+            data = data.loc[data[col_name].astype(str).str.contains(str(filter_value), case=False, regex=False, na=False)]
+        elif operator == 'datestartswith':
+            data = data.loc[data[col_name].astype(str).str.startswith(str(filter_value))]
+    return data
+
+#APPLY THE TABLE SORT ORDER
+def apply_sort(data, sort_by):
+    sort_by = [col for col in (sort_by or []) if col['column_id'] in data.columns]
+    if not sort_by:
+        return data
+    return data.sort_values([col['column_id'] for col in sort_by],
+                            ascending=[col['direction'] == 'asc' for col in sort_by],
+                            kind='stable')
+
+#FILTER, SORT AND SLICE OUT THE ONE PAGE THE BROWSER IS SHOWING
+def query_page(data, page_current, page_size, sort_by, filter_query, columns):
+    data = apply_sort(apply_filter_query(data, filter_query), sort_by)
+    page_count = max(1, math.ceil(len(data) / page_size))
+    page_current = min(page_current or 0, page_count - 1)
+    page = data.iloc[page_current * page_size:(page_current + 1) * page_size]
+    page = page.reindex(columns=columns)
+    return page, page_current, page_count
+
+#TOOLTIPS FOR THE ROWS AND COLUMNS OF ONE PAGE ONLY
+def page_tooltips(page):
+    return [
+        {
+            column: {'value': '' if pd.isna(value) else str(value), 'type': 'markdown'}
+            for column, value in row.items()
+        } for row in page.to_dict('records')
+    ]
+
+if __name__ == '__main__':
+    None
@@ -0,0 +1,114 @@
+import os
+import time
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+#CALLBACKS SLOWER THAN THIS MANY SECONDS ARE LOGGED (0 TURNS THE LOG OFF)
+SLOW_CALLBACK_SECONDS = float(os.environ.get('CS_SLOW_CALLBACK_SECONDS', 0))
+
+#HISTOGRAM BUCKET BOUNDS
+duration_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+size_buckets = [1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7]
+
+_lock = threading.Lock()
+_metrics = {}
+
+#REGISTER (ONCE) AND RETURN THE SERIES TABLE OF A METRIC
+def _metric(name, kind, help_text, buckets=None):
+    metric = _metrics.get(name)
+    if metric is None:
+        metric = _metrics[name] = {'kind': kind, 'help': help_text, 'buckets': buckets, 'series': {}}
+    return metric
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+#ADD ONE OBSERVATION TO A HISTOGRAM
+def observe(name, value, labels=None, help_text='', buckets=duration_buckets):
+    with _lock:
+        metric = _metric(name, 'histogram', help_text, buckets)
+        series = metric['series'].setdefault(_label_key(labels), {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+#ADD TO A COUNTER
+def increment(name, amount=1, labels=None, help_text=''):
+    with _lock:
+        series = _metric(name, 'counter', help_text)['series']
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + amount
+
+#SET A GAUGE
+def set_gauge(name, value, labels=None, help_text=''):
+    with _lock:
+        _metric(name, 'gauge', help_text)['series'][_label_key(labels)] = value
+
+#TIME A PIPELINE STAGE (TOKEN CALL, QUERY, ENTITY POST, FLATTEN, FRAME BUILD, FIGURE BUILD, ...)
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('cs_stage_duration_seconds', time.perf_counter() - started, {'stage': stage},
+                'Seconds spent in each data or rendering stage')
+
+#COUNT ROWS (IDS, ALERTS, FRAME ROWS) A STAGE PROCESSED
+def count_rows(stage, rows):
+    increment('cs_rows_processed_total', rows, {'stage': stage}, 'Rows processed by each stage')
+
+#SIZE OF ONE DASH CALLBACK RESPONSE AS SENT TO THE BROWSER
+def observe_payload(callback, size):
+    observe('cs_callback_response_bytes', size, {'callback': callback},
+            'Bytes in each Dash callback response', size_buckets)
+
+#TIME A DASH CALLBACK AND LOG IT WHEN IT IS SLOW
+def instrument_callback(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                observe('cs_callback_duration_seconds', elapsed, {'callback': name}, 'Seconds spent in each Dash callback')
+                if SLOW_CALLBACK_SECONDS and elapsed >= SLOW_CALLBACK_SECONDS:
+                    log.warning('slow callback %s took %.3f s (inputs %r)', name, elapsed, args)
+        return wrapper
+    return decorator
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = ['{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(escaped) + '}'
+
+#EVERY METRIC IN THE PROMETHEUS TEXT EXPOSITION FORMAT
+def render():
+    lines = []
+    with _lock:
+        for name, metric in sorted(_metrics.items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            for key, value in sorted(metric['series'].items()):
+                if metric['kind'] != 'histogram':
+                    lines.append(f'{name}{_format_labels(key)} {value}')
+                    continue
+                for bound, bucket_count in zip(metric['buckets'], value['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {value['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+    return '\n'.join(lines) + '\n'
+
+if __name__ == '__main__':
+    None